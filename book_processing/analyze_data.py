@@ -1,7 +1,9 @@
 import os
 import json
-import re
-from collections import Counter, defaultdict
+from collections import Counter
+
+from token_scan import scan_tokens, KeywordSentenceCollector
+from mentions import iter_mentions
 
 def load_json_data(file_path):
     """Load JSON data from a file"""
@@ -15,13 +17,15 @@ def extract_character_profiles(characters_json):
     profiles = []
     
     for character in characters_json:
+        mentions = list(iter_mentions(character.get('mentions')))
+        
         # Skip unnamed or minor characters (those with few mentions)
-        if len(character['mentions']) < 5:
+        if len(mentions) < 5:
             continue
         
         # Get most common name for this character
         name_counter = Counter([
-            mention['text'] for mention in character['mentions'] 
+            mention['text'] for mention in mentions 
             if mention['type'] in ['PROP', 'NOM']  # Only consider proper nouns and nominal mentions
         ])
         
@@ -39,7 +43,7 @@ def extract_character_profiles(characters_json):
             'name': most_common_name,
             'aliases': list(name_counter.keys()),
             'quote_count': len(quotes),
-            'mention_count': len(character['mentions']),
+            'mention_count': len(mentions),
             'sample_quotes': quotes[:10],  # Include up to 10 sample quotes
             'gender': character.get('referential_gender', 'unknown')
         }
@@ -67,23 +71,10 @@ def extract_themes(characters_json, tokens_file_path):
         {"name": "Dehumanization", "keywords": ["human", "machine", "robot", "emotion", "feeling", "mechanical"]}
     ]
     
-    # Read tokens file to get context
-    word_context = defaultdict(list)
-    theme_evidence = defaultdict(list)
-    
-    # Process tokens to find theme evidence
-    with open(tokens_file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            parts = line.strip().split('\t')
-            if len(parts) >= 5:
-                word = parts[4].lower()
-                sentence_id = parts[1]
-                
-                # Check if this word is related to any theme
-                for theme in known_themes:
-                    if any(keyword in word for keyword in theme["keywords"]):
-                        # Store the sentence ID for context recovery later
-                        theme_evidence[theme["name"]].append(sentence_id)
+    # Process tokens to find theme evidence, storing sentence IDs for context recovery later
+    collector = KeywordSentenceCollector(known_themes)
+    scan_tokens(tokens_file_path, [collector])
+    theme_evidence = collector.evidence
     
     # Process themes with evidence
     themes_data = []
@@ -121,7 +112,7 @@ def extract_relationships(characters_json):
                 quote_text = quote['text'].lower()
                 
                 # Check if char2's name variants appear in char1's quotes
-                for mention in char2.get('mentions', []):
+                for mention in iter_mentions(char2.get('mentions')):
                     if mention['text'].lower() in quote_text:
                         mentions += 1
             
@@ -0,0 +1,189 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import contextlib
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+from run_processing_pipeline import Book, main as run_book_pipeline
+
+# Each book gets books/<book_id>/data and books/<book_id>/output
+BOOKS_ROOT = "book_processing/books"
+
+# Times a book may be in flight when a worker process dies before it is marked failed
+MAX_POOL_RESTARTS = 2
+
+def slugify(name):
+    """Turn a file name into a book ID usable in paths"""
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+def load_book_list(source):
+    """
+    Read the books to ingest from a directory of PDFs or a JSON manifest.
+
+    A manifest is a list of {"id": ..., "pdf": ...} objects; relative PDF
+    paths are resolved against the manifest's directory. For a directory,
+    every PDF in it is ingested with an ID derived from its file name.
+
+    Returns:
+        list: Dicts with "id" and "pdf" keys
+    """
+    if os.path.isdir(source):
+        books = [{"id": slugify(os.path.splitext(name)[0]), "pdf": os.path.join(source, name)}
+                 for name in sorted(os.listdir(source)) if name.lower().endswith(".pdf")]
+    else:
+        with open(source, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        base_dir = os.path.dirname(source)
+        books = [{"id": entry.get("id") or slugify(os.path.splitext(os.path.basename(entry["pdf"]))[0]),
+                  "pdf": os.path.join(base_dir, entry["pdf"])}
+                 for entry in manifest]
+
+    seen = set()
+    for book in books:
+        if book["id"] in seen:
+            raise ValueError(f"Duplicate book ID '{book['id']}' in {source}")
+        seen.add(book["id"])
+    return books
+
+def ingest_book(book_entry, books_root, force=False, max_stages=2, booknlp_spool=None):
+    """
+    Run the full pipeline for one book in a worker process.
+
+    The pipeline's output is written to a per-book pipeline.log rather than
+    the console, so logs from concurrent books do not interleave. With
+    booknlp_spool set, BookNLP runs on long-lived booknlp_worker processes
+    instead of loading the model in every book's worker.
+
+    Returns:
+        dict: Summary with the book ID, status, elapsed time and log path
+    """
+    book_dir = os.path.join(books_root, book_entry["id"])
+    book = Book(book_entry["id"], book_entry["pdf"],
+                os.path.join(book_dir, "data"), os.path.join(book_dir, "output"))
+    os.makedirs(book.data_dir, exist_ok=True)
+    os.makedirs(book.output_dir, exist_ok=True)
+    log_path = os.path.join(book_dir, "pipeline.log")
+
+    start = time.time()
+    error = None
+    with open(log_path, "w", encoding="utf-8") as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            success = run_book_pipeline(force=force, max_workers=max_stages, book=book,
+                                        sample_fallback=False, booknlp_spool=booknlp_spool)
+        except Exception as e:
+            success = False
+            error = repr(e)
+            print(f"Unhandled error: {error}")
+
+    return {
+        "id": book.book_id,
+        "pdf": book.pdf_path,
+        "status": "success" if success else "failed",
+        "error": error,
+        "seconds": round(time.time() - start, 2),
+        "output_dir": book.output_dir,
+        "log": log_path
+    }
+
+def failed_summary(book, error):
+    """Summary for a book whose worker did not return one"""
+    return {"id": book["id"], "pdf": book["pdf"], "status": "failed",
+            "error": error, "seconds": None, "output_dir": None, "log": None}
+
+def ingest_books(books, books_root=BOOKS_ROOT, workers=4, force=False, max_stages=2,
+                 booknlp_spool=None):
+    """
+    Ingest a list of books with a bounded pool of worker processes.
+
+    At most one book per worker is in flight. If a worker process dies
+    (e.g. killed for running out of memory), the pool is broken: the books
+    in flight are resubmitted to a new pool, each running on its own, and
+    a book in flight for more than MAX_POOL_RESTARTS such crashes is marked
+    failed.
+
+    Writes batch_summary.json to books_root with one entry per book.
+
+    Returns:
+        list: Per-book summaries, in the order of the input list
+    """
+    os.makedirs(books_root, exist_ok=True)
+    summaries = {}
+    crashes = Counter()
+    queue = deque(books)
+
+    def record(book, summary):
+        summaries[book["id"]] = summary
+        print(f"[{len(summaries)}/{len(books)}] {book['id']}: {summary['status']}")
+
+    while queue:
+        broken = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            running = {}
+            while running or (queue and not broken):
+                # Only books that had started are affected if the pool breaks, and books
+                # that were in flight during a crash run alone so the culprit is found
+                while queue and not broken and len(running) < workers:
+                    if running and (crashes[queue[0]["id"]]
+                                    or any(crashes[b["id"]] for b in running.values())):
+                        break
+                    book = queue.popleft()
+                    running[executor.submit(ingest_book, book, books_root, force, max_stages,
+                                            booknlp_spool)] = book
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    book = running.pop(future)
+                    try:
+                        record(book, future.result())
+                    except BrokenProcessPool:
+                        broken.append(book)
+                    except Exception as e:
+                        record(book, failed_summary(book, repr(e)))
+
+        retry = []
+        for book in broken:
+            crashes[book["id"]] += 1
+            if crashes[book["id"]] > MAX_POOL_RESTARTS:
+                record(book, failed_summary(book, f"Worker process died {crashes[book['id']]} times"))
+            else:
+                retry.append(book)
+        if retry:
+            print(f"A worker process died; restarting the pool for {len(retry)} unfinished book(s)")
+            queue.extendleft(reversed(retry))
+
+    ordered = [summaries[book["id"]] for book in books]
+    summary_path = os.path.join(books_root, "batch_summary.json")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "total": len(ordered),
+            "succeeded": sum(1 for s in ordered if s["status"] == "success"),
+            "failed": sum(1 for s in ordered if s["status"] != "success"),
+            "books": ordered
+        }, f, indent=2)
+    print(f"Batch summary saved to {summary_path}")
+    return ordered
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the processing pipeline for many books")
+    parser.add_argument("source", help="Directory of PDFs or a JSON manifest of books")
+    parser.add_argument("--books-root", default=BOOKS_ROOT,
+                        help="Directory that receives one subdirectory per book")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Number of books processed at once")
+    parser.add_argument("--max-stages", type=int, default=2,
+                        help="Maximum number of stages running at once within a book")
+    parser.add_argument("--force", action="store_true",
+                        help="Rerun cached stages even if their inputs are unchanged")
+    parser.add_argument("--booknlp-spool",
+                        help="Send BookNLP work to booknlp_worker processes watching this spool directory")
+    args = parser.parse_args()
+
+    summaries = ingest_books(load_book_list(args.source), args.books_root,
+                             workers=args.workers, force=args.force,
+                             max_stages=args.max_stages, booknlp_spool=args.booknlp_spool)
+    sys.exit(0 if all(s["status"] == "success" for s in summaries) else 1)
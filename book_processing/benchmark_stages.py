@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+benchmark_stages.py - Time the book_processing stages on 1984 scaled to 1x, 10x and 100x
+
+Scaled corpora are built by repeating data/1984.txt and the BookNLP outputs
+in data/1984_booknlp, shifting token offsets so every copy occupies its own
+span of the book. The repository does not ship a .tokens file, so one is
+synthesized from the text in BookNLP's column layout.
+
+Results are written as JSON with the time and throughput of every stage at
+every scale, plus a scaling exponent between consecutive scales: about 1.0
+means linear, clearly above 1.0 means the stage scales super-linearly.
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+TEXT_PATH = SCRIPT_DIR / "data" / "1984.txt"
+BOOKNLP_DIR = SCRIPT_DIR / "data" / "1984_booknlp"
+RESULTS_OUTPUT = SCRIPT_DIR / "output" / "benchmark_results.json"
+BOOK_ID = "1984"
+
+TOKENS_HEADER = ["paragraph_ID", "sentence_ID", "token_ID_within_sentence",
+                 "token_ID_within_document", "word", "lemma", "byte_onset", "byte_offset",
+                 "POS_tag", "fine_POS_tag", "dependency_relation", "syntactic_head_ID", "event"]
+
+TOKEN_PATTERN = re.compile(r"\w+(?:['’-]\w+)*|[^\w\s]")
+SENTENCE_END = {".", "!", "?"}
+
+def synthesize_tokens(text):
+    """
+    Tokenize the book into rows in BookNLP's .tokens layout.
+
+    Paragraphs are split at blank lines and sentences at terminal punctuation.
+    Tags are placeholders; only the IDs, words and offsets are meaningful.
+    """
+    rows = []
+    token_id = 0
+    sentence_id = 0
+    for paragraph_id, match in enumerate(re.finditer(r"(?:(?!\n\s*\n).)+", text, re.DOTALL)):
+        in_sentence = 0
+        for token in TOKEN_PATTERN.finditer(match.group()):
+            word = token.group()
+            onset = match.start() + token.start()
+            rows.append([paragraph_id, sentence_id, in_sentence, token_id, word, word.lower(),
+                         onset, onset + len(word), "X", "X", "dep", token_id, "O"])
+            token_id += 1
+            in_sentence += 1
+            if word in SENTENCE_END:
+                sentence_id += 1
+                in_sentence = 0
+        if in_sentence:
+            sentence_id += 1
+    return rows
+
+def read_tsv(path):
+    with open(path, "r", encoding="utf-8") as f:
+        header = f.readline().rstrip("\n").split("\t")
+        return header, [line.rstrip("\n").split("\t") for line in f]
+
+def write_scaled_tsv(path, header, rows, scale, shift_columns, shifts):
+    """Write rows repeated scale times, adding shifts[kind] * copy to each shifted column"""
+    columns = [(header.index(name), kind) for name, kind in shift_columns.items()]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\t".join(header) + "\n")
+        for copy in range(scale):
+            for row in rows:
+                row = list(row)
+                for idx, kind in columns:
+                    # Unresolved spans are written as "None" or negative IDs
+                    if str(row[idx]).isdigit():
+                        row[idx] = str(int(row[idx]) + shifts[kind] * copy)
+                f.write("\t".join(str(value) for value in row) + "\n")
+
+def build_scaled_corpus(scale, work_dir):
+    """
+    Build a copy of 1984 repeated scale times.
+
+    Returns:
+        dict: Paths of the scaled text and BookNLP files, plus input sizes
+    """
+    corpus_dir = os.path.join(work_dir, f"x{scale}")
+    booknlp_dir = os.path.join(corpus_dir, "booknlp")
+    os.makedirs(booknlp_dir, exist_ok=True)
+
+    # Text and page index in the layout written by extract_pdf_text
+    sys.path.insert(0, str(SCRIPT_DIR))
+    from extract_pdf_text import page_index_path, load_page_index
+
+    text_path = os.path.join(corpus_dir, f"{BOOK_ID}.txt")
+    source_index = load_page_index(str(TEXT_PATH))
+    with open(TEXT_PATH, "rb") as f:
+        source = f.read()
+    offsets = []
+    with open(text_path, "wb") as f:
+        for _ in range(scale):
+            base = f.tell()
+            offsets.extend([base + offset, length] for offset, length in source_index["pages"])
+            f.write(source)
+    with open(page_index_path(text_path), "w", encoding="utf-8") as f:
+        json.dump({"source": "benchmark", "text": os.path.basename(text_path),
+                   "page_count": len(offsets), "pages": offsets}, f)
+
+    # BookNLP outputs, each copy shifted past the end of the previous one
+    token_rows = synthesize_tokens(source.decode("utf-8"))
+    _, entity_rows = read_tsv(BOOKNLP_DIR / f"{BOOK_ID}.entities")
+    token_count = max(len(token_rows), max(int(row[2]) for row in entity_rows) + 1)
+    shifts = {
+        "token": token_count,
+        "paragraph": token_rows[-1][0] + 1,
+        "sentence": token_rows[-1][1] + 1,
+        "char": len(source.decode("utf-8"))
+    }
+    write_scaled_tsv(os.path.join(booknlp_dir, f"{BOOK_ID}.tokens"), TOKENS_HEADER, token_rows,
+                     scale, {"paragraph_ID": "paragraph", "sentence_ID": "sentence",
+                             "token_ID_within_document": "token", "syntactic_head_ID": "token",
+                             "byte_onset": "char", "byte_offset": "char"}, shifts)
+    for ext, shift_columns in [
+        ("entities", {"start_token": "token", "end_token": "token"}),
+        ("quotes", {"quote_start": "token", "quote_end": "token",
+                    "mention_start": "token", "mention_end": "token"}),
+        ("supersense", {"start_token": "token", "end_token": "token"}),
+    ]:
+        header, rows = read_tsv(BOOKNLP_DIR / f"{BOOK_ID}.{ext}")
+        write_scaled_tsv(os.path.join(booknlp_dir, f"{BOOK_ID}.{ext}"), header, rows,
+                         scale, shift_columns, shifts)
+
+    return {
+        "scale": scale,
+        "dir": corpus_dir,
+        "text": text_path,
+        "booknlp_dir": booknlp_dir,
+        "entities": os.path.join(booknlp_dir, f"{BOOK_ID}.entities"),
+        "tokens": os.path.join(booknlp_dir, f"{BOOK_ID}.tokens"),
+        "quotes": os.path.join(booknlp_dir, f"{BOOK_ID}.quotes"),
+        "sizes": {
+            "pages": len(offsets),
+            "tokens": len(token_rows) * scale,
+            "entities": len(entity_rows) * scale
+        }
+    }
+
+class Benchmark:
+    """
+    One function to time.
+
+    setup(corpus, cache) prepares the arguments outside the timed region and
+    may store intermediate results in cache for later benchmarks; items names
+    the input size that throughput is measured against.
+    """
+
+    def __init__(self, name, setup, run, items):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.items = items
+
+def quotes_for(corpus, cache):
+    """Quotes found in a corpus, computed once and shared between benchmarks"""
+    from extract_quotes import find_potential_quotes
+    from extract_pdf_text import iter_pages
+
+    if "quotes" not in cache:
+        cache["quotes"] = find_potential_quotes(iter_pages(corpus["text"]))
+    return cache["quotes"]
+
+def characters_for(corpus, cache):
+    from process_text_with_booknlp import extract_characters
+
+    if "characters" not in cache:
+        cache["characters"] = extract_characters(corpus["entities"], corpus["tokens"],
+                                                 corpus["quotes"])
+    return cache["characters"]
+
+def structured_characters_for(corpus, cache):
+    """Character JSON in the convert_to_structured_json format read by analyze_data"""
+    from process_1984 import convert_to_structured_json
+
+    if "structured" not in cache:
+        paths = convert_to_structured_json(corpus["booknlp_dir"], BOOK_ID)
+        with open(paths["characters"], "r", encoding="utf-8") as f:
+            cache["structured"] = json.load(f)
+    return cache["structured"]
+
+def original_theme_scan(tokens_file):
+    """
+    Theme keyword counting as extract_themes did it before the token scan rewrite.
+
+    Kept as the baseline the automaton is measured against, with its costs
+    intact: the whole book is appended to one string token by token,
+    multi-word keywords are searched for in its last 100 characters after
+    every token, and evidence sentences are deduplicated by scanning a list.
+    The only change is that the word is read from the "word" column; the
+    original read column 3, which holds token IDs.
+    """
+    from process_text_with_booknlp import THEME_KEYWORDS
+
+    theme_counts = {theme: 0 for theme in THEME_KEYWORDS}
+    theme_evidence = {theme: [] for theme in THEME_KEYWORDS}
+    text = ""
+    with open(tokens_file, "r", encoding="utf-8") as f:
+        header = f.readline().rstrip("\n").split("\t")
+        word_idx = header.index("word")
+        for line in f:
+            parts = line.strip().split("\t")
+            if len(parts) > word_idx:
+                token = parts[word_idx].lower()
+                sentence_id = parts[1]
+                text += token + " "
+                for theme, keywords in THEME_KEYWORDS.items():
+                    for keyword in keywords:
+                        if keyword == token or (len(keyword.split()) > 1 and keyword in text[-100:]):
+                            theme_counts[theme] += 1
+                            if sentence_id not in theme_evidence[theme]:
+                                theme_evidence[theme].append(sentence_id)
+    return theme_counts, theme_evidence
+
+def build_benchmarks():
+    import extract_quotes
+    import process_text_with_booknlp as booknlp_stages
+    import analyze_data
+    from extract_pdf_text import iter_pages
+
+    return [
+        Benchmark("find_potential_quotes",
+                  lambda c, cache: (iter_pages(c["text"]),),
+                  extract_quotes.find_potential_quotes, "pages"),
+        Benchmark("process_quotes_for_explorer",
+                  lambda c, cache: (quotes_for(c, cache),),
+                  extract_quotes.process_quotes_for_explorer, "quotes"),
+        Benchmark("extract_characters",
+                  lambda c, cache: (c["entities"], c["tokens"], c["quotes"]),
+                  booknlp_stages.extract_characters, "entities"),
+        Benchmark("extract_themes",
+                  lambda c, cache: (c["tokens"], None),
+                  booknlp_stages.extract_themes, "tokens"),
+        Benchmark("extract_themes.original_baseline",
+                  lambda c, cache: (c["tokens"],),
+                  original_theme_scan, "tokens"),
+        Benchmark("extract_relationships",
+                  lambda c, cache: (c["entities"], c["quotes"], c["tokens"],
+                                    characters_for(c, cache)),
+                  booknlp_stages.extract_relationships, "tokens"),
+        Benchmark("extract_themes_and_relationships",
+                  lambda c, cache: (c["entities"], c["tokens"], characters_for(c, cache)),
+                  booknlp_stages.extract_themes_and_relationships, "tokens"),
+        Benchmark("analyze_data.extract_character_profiles",
+                  lambda c, cache: (structured_characters_for(c, cache),),
+                  analyze_data.extract_character_profiles, "entities"),
+        Benchmark("analyze_data.extract_themes",
+                  lambda c, cache: (structured_characters_for(c, cache), c["tokens"]),
+                  analyze_data.extract_themes, "tokens"),
+        Benchmark("analyze_data.extract_relationships",
+                  lambda c, cache: (structured_characters_for(c, cache),),
+                  analyze_data.extract_relationships, "entities"),
+    ]
+
+def time_call(func, args_factory, repeat):
+    """Best wall time over repeat calls; args_factory is called afresh for every call"""
+    best = None
+    for _ in range(repeat):
+        args = args_factory()
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def run_benchmarks(scales, work_dir, repeat=1, budget_seconds=120.0, only=None):
+    """
+    Time every benchmark at every scale.
+
+    Once a benchmark takes longer than budget_seconds at one scale, larger
+    scales are skipped for it, so one super-linear function cannot stall the run.
+    """
+    sys.path.insert(0, str(SCRIPT_DIR))
+    benchmarks = [b for b in build_benchmarks() if not only or b.name in only]
+    results = {b.name: [] for b in benchmarks}
+    over_budget = set()
+
+    for scale in scales:
+        print(f"\n===== Building {scale}x corpus =====")
+        corpus = build_scaled_corpus(scale, work_dir)
+        cache = {}
+        for benchmark in benchmarks:
+            if benchmark.name in over_budget:
+                results[benchmark.name].append({"scale": scale, "skipped": "over budget"})
+                continue
+            # Stage functions print progress; keep the benchmark output readable
+            with open(os.devnull, "w") as devnull:
+                stdout, sys.stdout = sys.stdout, devnull
+                try:
+                    benchmark.setup(corpus, cache)
+                    seconds = time_call(benchmark.run, lambda: benchmark.setup(corpus, cache), repeat)
+                finally:
+                    sys.stdout = stdout
+            items = (len(quotes_for(corpus, cache)) if benchmark.items == "quotes"
+                     else corpus["sizes"][benchmark.items])
+            entry = {
+                "scale": scale,
+                "seconds": round(seconds, 4),
+                "items": items,
+                "item_kind": benchmark.items,
+                "throughput_per_second": round(items / seconds, 1) if seconds > 0 else None
+            }
+            previous = [r for r in results[benchmark.name] if "seconds" in r]
+            if previous and previous[-1]["seconds"] > 0 and seconds > 0:
+                entry["scaling_exponent"] = round(
+                    math.log(seconds / previous[-1]["seconds"]) / math.log(scale / previous[-1]["scale"]), 2)
+            results[benchmark.name].append(entry)
+            print(f"{benchmark.name:45s} {scale:>4d}x  {seconds:9.3f}s  "
+                  f"{entry['throughput_per_second']} {benchmark.items}/s")
+            if seconds > budget_seconds:
+                over_budget.add(benchmark.name)
+
+        shutil.rmtree(corpus["dir"], ignore_errors=True)
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the book_processing stages")
+    parser.add_argument("--scales", default="1,10,100",
+                        help="Comma-separated corpus sizes, as multiples of 1984")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per measurement (best is kept)")
+    parser.add_argument("--budget", type=float, default=120.0,
+                        help="Skip larger scales for a function once one run exceeds this many seconds")
+    parser.add_argument("--only", nargs="*", help="Benchmark names to run (default: all)")
+    parser.add_argument("--output", default=str(RESULTS_OUTPUT), help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    scales = sorted(int(s) for s in args.scales.split(","))
+    work_dir = tempfile.mkdtemp(prefix="bookbuddy-bench-")
+    try:
+        results = run_benchmarks(scales, work_dir, repeat=args.repeat,
+                                 budget_seconds=args.budget, only=args.only)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"generated": time.time(), "scales": scales, "benchmarks": results}, f, indent=2)
+    print(f"\nBenchmark results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import re
+import json
+import heapq
+from collections import Counter
+
+# Start of the character list in a BookNLP .book file
+CHARACTERS_START = re.compile(r'"characters"\s*:\s*\[')
+SEPARATOR = re.compile(r"[\s,]*")
+
+def iter_book_characters(book_file, chunk_size=1 << 16):
+    """
+    Yield the character records of a BookNLP .book file one at a time.
+
+    The file is read in chunks and each record is decoded as soon as it is
+    complete, so memory holds one record plus a chunk however long the book
+    is. Stop iterating to stop reading.
+
+    Args:
+        book_file (str): Path to the .book file
+        chunk_size (int): Characters to read at a time
+
+    Yields:
+        dict: One entry of the file's "characters" list
+    """
+    decoder = json.JSONDecoder()
+    with open(book_file, "r", encoding="utf-8") as f:
+        buffer = ""
+        while True:
+            match = CHARACTERS_START.search(buffer)
+            if match:
+                position = match.end()
+                break
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            buffer += chunk
+
+        while True:
+            position = SEPARATOR.match(buffer, position).end()
+            if position < len(buffer):
+                if buffer[position] == "]":
+                    return
+                try:
+                    record, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    record = None
+                if record is not None:
+                    position = end
+                    yield record
+                    continue
+            # The next record is incomplete; read more, at least doubling the
+            # buffer so a very large record is not re-decoded once per chunk
+            chunk = f.read(max(chunk_size, len(buffer) - position))
+            if not chunk:
+                raise ValueError(f"{book_file} ends inside the characters list")
+            buffer = buffer[position:] + chunk
+            position = 0
+
+def top_book_characters(book_file, n):
+    """The n most frequently mentioned character records, keeping only n in memory"""
+    return heapq.nlargest(n, iter_book_characters(book_file), key=lambda record: record.get("count", 0))
+
+def summarize_book_character(record, top=10):
+    """
+    Condense a .book character record into the words most often linked to it.
+
+    Returns:
+        dict: The character's most frequent actions (verbs it is the agent
+            of), what is done to it (verbs it is the patient of), attributes
+            (adjectival modifiers) and possessions, plus BookNLP's pronoun
+            inference
+    """
+    def most_common(role):
+        return [word for word, _ in Counter(item["w"].lower() for item in record.get(role, [])).most_common(top)]
+
+    return {
+        "id": str(record["id"]),
+        "actions": most_common("agent"),
+        "acted_on": most_common("patient"),
+        "attributes": most_common("mod"),
+        "possessions": most_common("poss"),
+        "pronouns": record.get("g", {}).get("argmax") if record.get("g") else None
+    }
+
+def load_character_summaries(book_file, character_ids, top=10):
+    """
+    Summaries for the given characters, stopping as soon as all are found.
+
+    BookNLP lists characters by mention count, so for the main characters
+    only the start of the file is read.
+
+    Args:
+        book_file (str): Path to the .book file
+        character_ids (iterable): Character IDs (as strings) to summarize
+
+    Returns:
+        dict: Character ID to summarize_book_character output
+    """
+    wanted = set(character_ids)
+    summaries = {}
+    for record in iter_book_characters(book_file):
+        character_id = str(record["id"])
+        if character_id in wanted:
+            summaries[character_id] = summarize_book_character(record, top)
+            if len(summaries) == len(wanted):
+                break
+    return summaries
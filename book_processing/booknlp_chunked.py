@@ -0,0 +1,252 @@
+import os
+import re
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from process_text_with_booknlp import process_book_with_booknlp, BOOKNLP_OUTPUT_EXTENSIONS, MODEL_PARAMS
+from stage_cache import load_manifest, save_manifest
+
+# Paragraph breaks, and paragraphs that open a new chapter or part
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+CHAPTER_HEADING = re.compile(r"\s*(chapter|part)\b", re.IGNORECASE)
+
+# Which kind of global offset each ID column needs when chunks are stitched together
+TSV_OFFSET_COLUMNS = {
+    "tokens": {
+        "paragraph_ID": "paragraph",
+        "sentence_ID": "sentence",
+        "token_ID_within_document": "token",
+        "syntactic_head_ID": "token",
+        "byte_onset": "char",
+        "byte_offset": "char"
+    },
+    "entities": {
+        "COREF": "coref",
+        "start_token": "token",
+        "end_token": "token"
+    },
+    "quotes": {
+        "quote_start": "token",
+        "quote_end": "token",
+        "mention_start": "token",
+        "mention_end": "token",
+        "char_id": "coref"
+    },
+    "supersense": {
+        "start_token": "token",
+        "end_token": "token"
+    }
+}
+
+def split_into_chunks(text, target_chars):
+    """
+    Split a book into chunks of roughly target_chars at paragraph boundaries.
+
+    A chunk is closed early at a chapter heading once it is at least half
+    the target size, so chunks tend to hold whole chapters.
+
+    Returns:
+        list: (start, end) character spans that cover the text exactly
+    """
+    spans = []
+    start = 0
+    for match in PARAGRAPH_BREAK.finditer(text):
+        boundary = match.end()
+        size = boundary - start
+        if size >= target_chars or (size >= target_chars // 2
+                                    and CHAPTER_HEADING.match(text, boundary)):
+            spans.append((start, boundary))
+            start = boundary
+    if start < len(text) or not spans:
+        spans.append((start, len(text)))
+    return spans
+
+def chunk_book_id(book_id, index):
+    return f"{book_id}_part{index:04d}"
+
+def chunk_manifest_path(chunk_dir):
+    """The manifest recording which text each finished chunk's outputs were made from"""
+    return os.path.join(chunk_dir, "chunks.json")
+
+def chunk_key(chunk_text, chunk_chars):
+    """Hash of a chunk's text and the settings that produced it"""
+    digest = hashlib.sha256(chunk_text.encode("utf-8"))
+    digest.update(json.dumps({"chunk_chars": chunk_chars, "model_params": MODEL_PARAMS},
+                             sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+def chunk_outputs_exist(chunk_dir, chunk_id, key, manifest):
+    """
+    Whether a chunk's outputs can be reused.
+
+    The outputs must exist and have been made from the same chunk text and
+    settings, so editing the book or changing the chunk size reprocesses
+    the chunks that changed instead of merging stale outputs.
+    """
+    return (manifest.get(chunk_id) == key
+            and all(os.path.exists(os.path.join(chunk_dir, f"{chunk_id}.{ext}"))
+                    for ext in BOOKNLP_OUTPUT_EXTENSIONS))
+
+def process_chunk(chunk_path, chunk_dir, chunk_id):
+    """
+    Run BookNLP on one chunk in a worker process.
+
+    The model is loaded once per worker and reused for its later chunks.
+    """
+    process_book_with_booknlp(chunk_path, chunk_dir, chunk_id)
+    return chunk_id
+
+def read_tsv_rows(path):
+    """Yield the header and then each row of a BookNLP TSV file as lists of fields"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            yield line.rstrip("\n").split("\t")
+
+def column_max(path, column):
+    """Largest integer value in a TSV column, or -1 if the file has no rows"""
+    rows = read_tsv_rows(path)
+    idx = next(rows).index(column)
+    return max((int(row[idx]) for row in rows if len(row) > idx), default=-1)
+
+def chunk_sizes(chunk_dir, chunk_id):
+    """Number of tokens, paragraphs, sentences and coref ids used by a chunk"""
+    tokens_file = os.path.join(chunk_dir, f"{chunk_id}.tokens")
+    entities_file = os.path.join(chunk_dir, f"{chunk_id}.entities")
+    return {
+        "token": column_max(tokens_file, "token_ID_within_document") + 1,
+        "paragraph": column_max(tokens_file, "paragraph_ID") + 1,
+        "sentence": column_max(tokens_file, "sentence_ID") + 1,
+        "coref": column_max(entities_file, "COREF") + 1
+    }
+
+def merge_tsv(ext, chunk_files, chunk_offsets, output_path):
+    """
+    Concatenate one kind of BookNLP TSV output, shifting ID columns to global values.
+
+    Negative values (BookNLP's "none" markers) are left unchanged.
+    """
+    offset_columns = TSV_OFFSET_COLUMNS[ext]
+    with open(output_path, "w", encoding="utf-8") as out:
+        for chunk_index, (path, offsets) in enumerate(zip(chunk_files, chunk_offsets)):
+            rows = read_tsv_rows(path)
+            header = next(rows)
+            if chunk_index == 0:
+                out.write("\t".join(header) + "\n")
+            shifts = [(idx, offsets[offset_columns[name]])
+                      for idx, name in enumerate(header) if name in offset_columns]
+            for row in rows:
+                for idx, shift in shifts:
+                    if idx < len(row) and row[idx].lstrip("-").isdigit() and int(row[idx]) >= 0:
+                        row[idx] = str(int(row[idx]) + shift)
+                out.write("\t".join(row) + "\n")
+
+def merge_book_json(chunk_files, chunk_offsets, output_path):
+    """Concatenate the per-chunk .book character lists with global ids and token indexes"""
+    characters = []
+    for path, offsets in zip(chunk_files, chunk_offsets):
+        with open(path, "r", encoding="utf-8") as f:
+            chunk = json.load(f)
+        for character in chunk["characters"]:
+            character["id"] += offsets["coref"]
+            for role in ("agent", "patient", "mod", "poss"):
+                for item in character.get(role, []):
+                    item["i"] += offsets["token"]
+            characters.append(character)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({"characters": characters}, f)
+
+def process_book_in_chunks(input_file, output_dir, book_id, chunk_chars=500000, workers=2):
+    """
+    Process a long book with BookNLP in parallel chunks and stitch the outputs together.
+
+    The text is split at paragraph (preferably chapter) boundaries and each
+    chunk is processed by a pool of worker processes. Chunks whose outputs
+    already exist for the same chunk text and settings (recorded in
+    chunks/chunks.json) are not reprocessed, so a crashed run can be
+    resumed.
+    The merged .tokens, .entities, .quotes, .supersense and .book files use
+    global token, sentence, paragraph and character offsets.
+
+    Coreference is resolved within each chunk only, so a character that
+    appears in several chunks gets one coref id per chunk.
+
+    Args:
+        input_file (str): Path to the text file of the book
+        output_dir (str): Directory to save the merged BookNLP output files
+        book_id (str): ID for the book
+        chunk_chars (int): Target chunk size in characters
+        workers (int): Number of worker processes, each holding one model
+    """
+    with open(input_file, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    spans = split_into_chunks(text, chunk_chars)
+    chunk_dir = os.path.join(output_dir, "chunks")
+    os.makedirs(chunk_dir, exist_ok=True)
+    print(f"Split {input_file} into {len(spans)} chunks of about {chunk_chars} characters")
+
+    manifest_path = chunk_manifest_path(chunk_dir)
+    manifest = load_manifest(manifest_path)
+    chunk_ids = []
+    pending = []
+    keys = {}
+    for index, (start, end) in enumerate(spans):
+        chunk_id = chunk_book_id(book_id, index)
+        chunk_ids.append(chunk_id)
+        keys[chunk_id] = chunk_key(text[start:end], chunk_chars)
+        if chunk_outputs_exist(chunk_dir, chunk_id, keys[chunk_id], manifest):
+            continue
+        # Forget the old outputs until this chunk has been processed again
+        manifest.pop(chunk_id, None)
+        chunk_path = os.path.join(chunk_dir, f"{chunk_id}.txt")
+        with open(chunk_path, "w", encoding="utf-8") as f:
+            f.write(text[start:end])
+        pending.append((chunk_path, chunk_id))
+    del text
+    save_manifest(manifest, manifest_path)
+
+    print(f"Processing {len(pending)} chunks with {workers} workers "
+          f"({len(spans) - len(pending)} already done)")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(process_chunk, path, chunk_dir, chunk_id)
+                   for path, chunk_id in pending]
+        for future in futures:
+            chunk_id = future.result()
+            manifest[chunk_id] = keys[chunk_id]
+            save_manifest(manifest, manifest_path)
+            print(f"Finished chunk {chunk_id}")
+
+    # Global offset of each chunk is the running total of the sizes before it
+    chunk_offsets = []
+    totals = {"token": 0, "paragraph": 0, "sentence": 0, "coref": 0}
+    for (start, _), chunk_id in zip(spans, chunk_ids):
+        chunk_offsets.append(dict(totals, char=start))
+        for kind, size in chunk_sizes(chunk_dir, chunk_id).items():
+            totals[kind] += size
+
+    for ext in TSV_OFFSET_COLUMNS:
+        merge_tsv(ext, [os.path.join(chunk_dir, f"{chunk_id}.{ext}") for chunk_id in chunk_ids],
+                  chunk_offsets, os.path.join(output_dir, f"{book_id}.{ext}"))
+    merge_book_json([os.path.join(chunk_dir, f"{chunk_id}.book") for chunk_id in chunk_ids],
+                    chunk_offsets, os.path.join(output_dir, f"{book_id}.book"))
+
+    print(f"Merged {len(chunk_ids)} chunks ({totals['token']} tokens) into {output_dir}")
+    return output_dir
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run BookNLP over a long book in parallel chunks")
+    parser.add_argument("--input", default="book_processing/data/1984.txt",
+                        help="Path to the text file of the book")
+    parser.add_argument("--output-dir", default="book_processing/data/1984_booknlp",
+                        help="Directory to save the merged BookNLP output files")
+    parser.add_argument("--book-id", default="1984", help="ID for the book")
+    parser.add_argument("--chunk-chars", type=int, default=500000,
+                        help="Target chunk size in characters")
+    parser.add_argument("--workers", type=int, default=2,
+                        help="Number of worker processes, each loading its own model")
+    args = parser.parse_args()
+
+    process_book_in_chunks(args.input, args.output_dir, args.book_id,
+                           chunk_chars=args.chunk_chars, workers=args.workers)
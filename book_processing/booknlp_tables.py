@@ -0,0 +1,329 @@
+import os
+import sys
+import json
+import mmap
+import struct
+from array import array
+
+# Binary cache written beside each parsed TSV (see write_table_cache)
+CACHE_SUFFIX = ".cache"
+CACHE_MAGIC = b"BNLPTBL1"
+
+# Column kinds:
+#   "int"      - stored in a 64-bit integer array; non-numeric values ("None") become -1
+#   "category" - small integer codes into a per-column Vocabulary
+#   "text"     - a list of interned strings
+ENTITIES_SCHEMA = {
+    "COREF": "int",
+    "start_token": "int",
+    "end_token": "int",
+    "prop": "category",
+    "cat": "category",
+    "text": "text"
+}
+
+QUOTES_SCHEMA = {
+    "quote_start": "int",
+    "quote_end": "int",
+    "mention_start": "int",
+    "mention_end": "int",
+    "mention_phrase": "text",
+    "char_id": "int",
+    "quote": "text"
+}
+
+SUPERSENSE_SCHEMA = {
+    "start_token": "int",
+    "end_token": "int",
+    "supersense_category": "category",
+    "text": "text"
+}
+
+TOKENS_SCHEMA = {
+    "paragraph_ID": "int",
+    "sentence_ID": "int",
+    "token_ID_within_sentence": "int",
+    "token_ID_within_document": "int",
+    "word": "category",
+    "lemma": "category",
+    "byte_onset": "int",
+    "byte_offset": "int",
+    "POS_tag": "category",
+    "fine_POS_tag": "category",
+    "dependency_relation": "category",
+    "syntactic_head_ID": "int",
+    "event": "category"
+}
+
+class Vocabulary:
+    """Maps strings to dense integer codes and back"""
+
+    def __init__(self):
+        self.codes = {}
+        self.strings = []
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.strings)
+            self.codes[value] = code
+            self.strings.append(value)
+        return code
+
+    def code(self, value, default=-1):
+        """Code of an existing value, or default if it never occurs in the column"""
+        return self.codes.get(value, default)
+
+    def decode(self, code):
+        return self.strings[code]
+
+    def __len__(self):
+        return len(self.strings)
+
+class StringColumn:
+    """
+    A text column stored as one UTF-8 buffer plus row offsets.
+
+    Used for tables loaded from the binary cache, so strings are only
+    decoded when a row is read.
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        return str(self.data[self.offsets[row]:self.offsets[row + 1]], "utf-8")
+
+    def __iter__(self):
+        offsets = self.offsets
+        data = self.data
+        for row in range(len(offsets) - 1):
+            yield str(data[offsets[row]:offsets[row + 1]], "utf-8")
+
+class Table:
+    """
+    A BookNLP output file held column by column.
+
+    Integer columns are arrays, categorical columns are arrays of codes with
+    a Vocabulary in table.vocab[column], and text columns are lists of
+    interned strings. Index a column by its BookNLP header name.
+
+    Tables loaded from the binary cache hold read-only memoryviews over the
+    memory-mapped file instead of arrays, and StringColumns for text.
+    """
+
+    def __init__(self, columns, vocab, mapping=None):
+        self.columns = columns
+        self.vocab = vocab
+        # Keeps the memory map open for as long as the columns are in use
+        self._mapping = mapping
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def value(self, name, row):
+        """Decoded value of one cell"""
+        value = self.columns[name][row]
+        return self.vocab[name].decode(value) if name in self.vocab else value
+
+def parse_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        return -1
+
+def load_table(path, schema, use_cache=True):
+    """
+    Load a tab-separated BookNLP file into a columnar Table.
+
+    Columns are located by header name, so files from BookNLP versions that
+    add or reorder columns load the same way. Columns not in the schema are
+    dropped; rows with fewer fields than the header are skipped.
+
+    After the first parse a binary cache is written beside the file; later
+    loads memory-map it instead of parsing, as long as the TSV's size and
+    modification time are unchanged.
+
+    Args:
+        path (str): Path to the BookNLP file
+        schema (dict): Column name to kind ("int", "category" or "text")
+        use_cache (bool): Read and write the binary cache
+
+    Returns:
+        Table: The file's columns
+    """
+    if use_cache:
+        table = read_table_cache(path, schema)
+        if table is not None:
+            return table
+
+    table = parse_table(path, schema)
+
+    if use_cache:
+        try:
+            write_table_cache(table, path, schema)
+        except OSError as e:
+            # A read-only data directory only costs the speed-up
+            print(f"Could not write table cache for {path}: {e}")
+    return table
+
+def parse_table(path, schema):
+    """Parse a BookNLP TSV file into a Table (see load_table)"""
+    with open(path, "r", encoding="utf-8") as f:
+        header = f.readline().rstrip("\n").split("\t")
+        wanted = [(idx, name, schema[name]) for idx, name in enumerate(header) if name in schema]
+        columns = {}
+        vocab = {}
+        for _, name, kind in wanted:
+            if kind == "int":
+                columns[name] = array("q")
+            elif kind == "category":
+                columns[name] = array("q")
+                vocab[name] = Vocabulary()
+            else:
+                columns[name] = []
+
+        appenders = []
+        for idx, name, kind in wanted:
+            column = columns[name]
+            if kind == "int":
+                appenders.append((idx, column.append, parse_int))
+            elif kind == "category":
+                appenders.append((idx, column.append, vocab[name].encode))
+            else:
+                appenders.append((idx, column.append, sys.intern))
+
+        width = len(header)
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) < width:
+                continue
+            for idx, append, convert in appenders:
+                append(convert(parts[idx]))
+
+    return Table(columns, vocab)
+
+def cache_path(path):
+    return path + CACHE_SUFFIX
+
+def source_signature(path):
+    """Size and modification time of a TSV, used to detect stale caches"""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def write_table_cache(table, path, schema):
+    """
+    Write a table to its binary cache file.
+
+    Layout: the magic bytes, a little-endian u32 header length, a JSON header
+    describing each column, then the column data. Integer and category
+    columns are int64 arrays; text columns are int64 offsets followed by
+    the UTF-8 bytes of all rows. Every section starts on an 8-byte boundary
+    so it can be viewed in place.
+    """
+    sections = []
+    columns = []
+    position = 0
+
+    def add_section(data):
+        nonlocal position
+        offset = position
+        sections.append(data)
+        padding = -len(data) % 8
+        if padding:
+            sections.append(b"\0" * padding)
+        position += len(data) + padding
+        return offset, len(data)
+
+    for name, column in table.columns.items():
+        kind = schema[name]
+        entry = {"name": name, "kind": kind}
+        if kind == "text":
+            encoded = [value.encode("utf-8") for value in column]
+            offsets = array("q", [0])
+            for value in encoded:
+                offsets.append(offsets[-1] + len(value))
+            entry["offsets"] = add_section(offsets.tobytes())
+            entry["data"] = add_section(b"".join(encoded))
+        else:
+            entry["data"] = add_section(array("q", column).tobytes())
+            if kind == "category":
+                entry["strings"] = table.vocab[name].strings
+        columns.append(entry)
+
+    header = json.dumps({
+        "source": source_signature(path),
+        "schema": schema,
+        "rows": len(table),
+        "columns": columns
+    }).encode("utf-8")
+    prefix = CACHE_MAGIC + struct.pack("<I", len(header)) + header
+    prefix += b"\0" * (-len(prefix) % 8)
+
+    tmp_path = cache_path(path) + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(prefix)
+        for section in sections:
+            f.write(section)
+    os.replace(tmp_path, cache_path(path))
+
+def read_table_cache(path, schema):
+    """Memory-map a table's binary cache, or return None if it is missing or stale"""
+    cache_file = cache_path(path)
+    if not os.path.exists(cache_file):
+        return None
+
+    with open(cache_file, "rb") as f:
+        if f.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+            return None
+        header_length, = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_length))
+        if header["source"] != source_signature(path) or header["schema"] != schema:
+            return None
+        base = len(CACHE_MAGIC) + 4 + header_length
+        base += -base % 8
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(mapping)
+    columns = {}
+    vocab = {}
+    for entry in header["columns"]:
+        offset, length = entry["data"]
+        data = view[base + offset:base + offset + length]
+        if entry["kind"] == "text":
+            offsets_at, offsets_length = entry["offsets"]
+            offsets = view[base + offsets_at:base + offsets_at + offsets_length].cast("q")
+            columns[entry["name"]] = StringColumn(offsets, data)
+        else:
+            columns[entry["name"]] = data.cast("q")
+            if entry["kind"] == "category":
+                vocabulary = Vocabulary()
+                for value in entry["strings"]:
+                    vocabulary.encode(value)
+                vocab[entry["name"]] = vocabulary
+
+    return Table(columns, vocab, mapping)
+
+def load_entities(path):
+    return load_table(path, ENTITIES_SCHEMA)
+
+def load_quotes(path):
+    return load_table(path, QUOTES_SCHEMA)
+
+def load_supersense(path):
+    return load_table(path, SUPERSENSE_SCHEMA)
+
+def load_tokens(path):
+    return load_table(path, TOKENS_SCHEMA)
@@ -0,0 +1,260 @@
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import argparse
+import threading
+from contextlib import contextmanager
+
+# Jobs move incoming -> processing -> done (or failed) inside the spool directory
+SPOOL_DIR = "book_processing/booknlp_spool"
+SPOOL_STATES = ["incoming", "processing", "done", "failed"]
+
+# A worker touches the job it is processing every HEARTBEAT_INTERVAL seconds;
+# a job in processing/ untouched for STALE_AFTER seconds was abandoned
+HEARTBEAT_INTERVAL = 30.0
+STALE_AFTER = 300.0
+
+# Seconds the pipeline waits for a queued job before giving up
+DEFAULT_JOB_TIMEOUT = 4 * 60 * 60
+
+def ensure_spool(spool_dir):
+    """Create the spool subdirectories if they do not exist"""
+    for state in SPOOL_STATES:
+        os.makedirs(os.path.join(spool_dir, state), exist_ok=True)
+
+def write_json_atomic(data, path):
+    """Write JSON to a temporary file and rename it, so readers never see a partial file"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+def submit_job(input_file, output_dir, book_id, spool_dir=SPOOL_DIR):
+    """
+    Queue a book for a running BookNLP worker.
+
+    Args:
+        input_file (str): Path to the text file of the book
+        output_dir (str): Directory to save the BookNLP output files
+        book_id (str): ID for the book
+
+    Returns:
+        str: Job ID to pass to wait_for_job
+    """
+    ensure_spool(spool_dir)
+    # Time-prefixed IDs keep the queue roughly first-in, first-out
+    job_id = f"{time.time():.6f}-{uuid.uuid4().hex[:8]}"
+    job = {
+        "id": job_id,
+        "input_file": os.path.abspath(input_file),
+        "output_dir": os.path.abspath(output_dir),
+        "book_id": book_id,
+        "submitted": time.time()
+    }
+    write_json_atomic(job, os.path.join(spool_dir, "incoming", f"{job_id}.json"))
+    return job_id
+
+def wait_for_job(job_id, spool_dir=SPOOL_DIR, timeout=DEFAULT_JOB_TIMEOUT, poll_interval=2.0):
+    """
+    Block until a worker has finished a job.
+
+    If the job times out before any worker claimed it (for example because
+    no worker is running), it is withdrawn from the queue.
+
+    Args:
+        timeout (float): Seconds to wait, or None to wait indefinitely
+
+    Returns:
+        dict: The job result, with "status" set to "done" or "failed"
+
+    Raises:
+        TimeoutError: If the job has not finished within timeout seconds
+    """
+    deadline = time.time() + timeout if timeout is not None else None
+    while True:
+        for state in ("done", "failed"):
+            result_path = os.path.join(spool_dir, state, f"{job_id}.json")
+            if os.path.exists(result_path):
+                with open(result_path, "r", encoding="utf-8") as f:
+                    result = json.load(f)
+                # The submitter is the only reader, so results do not pile up in the spool
+                os.remove(result_path)
+                return result
+        if deadline is not None and time.time() > deadline:
+            try:
+                os.remove(os.path.join(spool_dir, "incoming", f"{job_id}.json"))
+                reason = "no worker claimed it; is a booknlp_worker running?"
+            except FileNotFoundError:
+                reason = "a worker is still processing it"
+            raise TimeoutError(f"BookNLP job {job_id} did not finish within {timeout}s ({reason})")
+        time.sleep(poll_interval)
+
+def run_via_worker(input_file, output_dir, book_id, spool_dir=SPOOL_DIR, timeout=DEFAULT_JOB_TIMEOUT):
+    """Process a book on a running worker, raising if the worker reports a failure"""
+    print(f"Queueing {input_file} for the BookNLP worker in {spool_dir}...")
+    result = wait_for_job(submit_job(input_file, output_dir, book_id, spool_dir),
+                          spool_dir, timeout=timeout)
+    if result["status"] != "done":
+        raise RuntimeError(f"BookNLP worker failed on {book_id}: {result.get('error')}")
+    print(f"BookNLP worker finished {book_id} in {result['seconds']}s")
+    return output_dir
+
+def claim_next_job(spool_dir):
+    """
+    Move the oldest incoming job to processing and return it, or None if the queue is empty.
+
+    The rename is atomic, so several workers can share one spool without
+    processing the same job twice. The claimed job records this worker's
+    host and PID for reclaim_stale_jobs. A job that already has a result
+    (it was requeued while its first worker was still running) is dropped.
+    """
+    incoming_dir = os.path.join(spool_dir, "incoming")
+    for name in sorted(n for n in os.listdir(incoming_dir) if n.endswith(".json")):
+        processing_path = os.path.join(spool_dir, "processing", name)
+        try:
+            os.rename(os.path.join(incoming_dir, name), processing_path)
+        except FileNotFoundError:
+            continue  # Another worker claimed it first
+        if any(os.path.exists(os.path.join(spool_dir, state, name)) for state in ("done", "failed")):
+            os.remove(processing_path)
+            continue
+        os.utime(processing_path)  # The rename keeps the submission time; start the heartbeat now
+        with open(processing_path, "r", encoding="utf-8") as f:
+            job = json.load(f)
+        job["worker"] = {"host": socket.gethostname(), "pid": os.getpid()}
+        job["claimed"] = time.time()
+        write_json_atomic(job, processing_path)
+        return job
+    return None
+
+def process_alive(pid):
+    """Whether a process with this PID exists on this host"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def reclaim_stale_jobs(spool_dir, stale_after=STALE_AFTER):
+    """
+    Move jobs abandoned by dead workers from processing back to incoming.
+
+    A job is abandoned if the worker that claimed it ran on this host and
+    is no longer running (or is this process, which holds no job yet), or
+    if its heartbeat has stopped for stale_after seconds.
+
+    Returns:
+        int: The number of jobs requeued
+    """
+    processing_dir = os.path.join(spool_dir, "processing")
+    host = socket.gethostname()
+    requeued = 0
+    for name in sorted(n for n in os.listdir(processing_dir) if n.endswith(".json")):
+        processing_path = os.path.join(processing_dir, name)
+        try:
+            with open(processing_path, "r", encoding="utf-8") as f:
+                job = json.load(f)
+            idle = time.time() - os.path.getmtime(processing_path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue  # Finished, or being rewritten, just now
+        worker = job.get("worker") or {}
+        dead_here = (worker.get("host") == host
+                     and (worker.get("pid") == os.getpid() or not process_alive(worker.get("pid", -1))))
+        if not (dead_here or idle > stale_after):
+            continue
+        try:
+            os.rename(processing_path, os.path.join(spool_dir, "incoming", name))
+        except FileNotFoundError:
+            continue  # Another worker reclaimed it first
+        print(f"Requeued abandoned BookNLP job {job.get('id', name)} ({job.get('book_id')})")
+        requeued += 1
+    return requeued
+
+@contextmanager
+def heartbeat(path, interval=HEARTBEAT_INTERVAL):
+    """Touch path every interval seconds while the block runs, so the job is not reclaimed"""
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(interval):
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                return
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+def serve(spool_dir=SPOOL_DIR, poll_interval=2.0, once=False):
+    """
+    Load BookNLP once and process queued books until interrupted.
+
+    Args:
+        spool_dir (str): Spool directory shared with submit_job
+        poll_interval (float): Seconds to sleep when the queue is empty
+        once (bool): Exit as soon as the queue is empty
+    """
+    from process_text_with_booknlp import load_booknlp, process_book_with_booknlp
+
+    ensure_spool(spool_dir)
+    reclaim_stale_jobs(spool_dir)
+    print("Loading BookNLP model...")
+    load_booknlp()
+    print(f"BookNLP worker ready, watching {spool_dir}")
+
+    while True:
+        job = claim_next_job(spool_dir)
+        if job is None:
+            # Pick up jobs left behind by workers that died while we were idle
+            if reclaim_stale_jobs(spool_dir):
+                continue
+            if once:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        start = time.time()
+        try:
+            with heartbeat(os.path.join(spool_dir, "processing", f"{job['id']}.json")):
+                process_book_with_booknlp(job["input_file"], job["output_dir"], job["book_id"])
+            job["status"] = "done"
+            job["error"] = None
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = repr(e)
+            print(f"Error processing {job['book_id']}: {e}")
+        job["seconds"] = round(time.time() - start, 2)
+
+        write_json_atomic(job, os.path.join(spool_dir, job["status"], f"{job['id']}.json"))
+        # If the job was reclaimed while it ran, its claim is gone and a copy may be
+        # queued again; drop the copy so it is not processed twice
+        for state in ("processing", "incoming"):
+            try:
+                os.remove(os.path.join(spool_dir, state, f"{job['id']}.json"))
+            except FileNotFoundError:
+                pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve BookNLP jobs from a spool directory")
+    parser.add_argument("--spool", default=SPOOL_DIR, help="Spool directory to watch")
+    parser.add_argument("--poll-interval", type=float, default=2.0,
+                        help="Seconds to wait between checks of an empty queue")
+    parser.add_argument("--once", action="store_true",
+                        help="Exit when the queue is empty instead of waiting for more jobs")
+    args = parser.parse_args()
+
+    try:
+        serve(args.spool, args.poll_interval, args.once)
+    except KeyboardInterrupt:
+        print("\nBookNLP worker stopped")
+        sys.exit(0)
@@ -0,0 +1,112 @@
+import re
+from collections import Counter
+
+# Leading words dropped when comparing proper names, so "Comrade Ogilvy",
+# "Mr Charrington" and "Charrington" compare equal. "Mrs", "Ms" and "Miss"
+# are deliberately kept: they usually name a different person from the bare
+# surname, as with Mrs Parsons and her husband Parsons
+TITLES = {"mr", "mister", "comrade", "dr", "doctor"}
+
+# An alias only links two clusters if it makes up at least this share of
+# each cluster's proper-name mentions, so a stray coref error (Winston's
+# cluster containing "Goldstein" a few times) does not merge two people
+MIN_ALIAS_SHARE = 0.1
+
+def alias_key(alias):
+    """
+    Normalize a proper name for comparison.
+
+    Case, punctuation, leading TITLES and spaces are dropped, which also
+    rejoins names split across a line in the PDF ("Win - ston"). Clusters
+    named "Mr Parsons" and "Parsons" therefore merge, while "Mrs Parsons"
+    stays separate.
+    """
+    words = alias.lower().replace(".", " ").split()
+    while len(words) > 1 and words[0] in TITLES:
+        words = words[1:]
+    return re.sub(r"\W|_", "", "".join(words))
+
+class UnionFind:
+    """
+    Disjoint sets with path halving and union by weight.
+
+    Each set also tracks its leader, the member added with the largest
+    weight; this differs from the root, which is the side with the larger
+    accumulated weight at each union.
+    """
+
+    def __init__(self):
+        self.parent = {}
+        self.weight = {}
+        self.own_weight = {}
+        self.leaders = {}
+
+    def add(self, item, weight=1):
+        if item not in self.parent:
+            self.parent[item] = item
+            self.weight[item] = weight
+            self.own_weight[item] = weight
+            self.leaders[item] = item
+
+    def find(self, item):
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def leader(self, item):
+        """The heaviest member of item's set; ties go to the member that led first"""
+        return self.leaders[self.find(item)]
+
+    def union(self, a, b):
+        """Merge the sets of a and b; the heavier root stays the root"""
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return a
+        if self.weight[a] < self.weight[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.weight[a] += self.weight[b]
+        leader_a, leader_b = self.leaders[a], self.leaders.pop(b)
+        if self.own_weight[leader_b] > self.own_weight[leader_a]:
+            self.leaders[a] = leader_b
+        return a
+
+def consolidate_clusters(proper_aliases, mention_counts, min_share=MIN_ALIAS_SHARE):
+    """
+    Group coref clusters that share a significant proper-name alias.
+
+    Each cluster is linked to the first cluster seen with the same
+    normalized alias, so the work is linear in the number of aliases plus
+    near-constant union-find operations.
+
+    Args:
+        proper_aliases (dict): Cluster ID to a Counter of its proper-name mention texts
+        mention_counts (dict): Cluster ID to its number of mentions; the
+            single cluster with the most mentions represents each group
+
+    Returns:
+        dict: Cluster ID to the ID of its group's representative
+    """
+    groups = UnionFind()
+    for cluster_id, count in mention_counts.items():
+        groups.add(cluster_id, count)
+
+    first_with_key = {}
+    for cluster_id, aliases in proper_aliases.items():
+        keys = Counter()
+        for alias, count in aliases.items():
+            key = alias_key(alias)
+            if key:
+                keys[key] += count
+        total = sum(keys.values())
+        for key, count in keys.items():
+            if count < min_share * total:
+                continue
+            if key in first_with_key:
+                groups.union(first_with_key[key], cluster_id)
+            else:
+                first_with_key[key] = cluster_id
+
+    return {cluster_id: groups.leader(cluster_id) for cluster_id in mention_counts}
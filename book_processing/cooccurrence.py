@@ -0,0 +1,100 @@
+from collections import defaultdict
+
+# Units a pair of characters can co-occur in. "window" pairs mentions that
+# start within window_tokens tokens of each other instead of using fixed units.
+UNITS = ("sentence", "paragraph", "chapter", "window")
+
+def incidence_rows(mentions, unit):
+    """
+    Build the unit x character incidence matrix in compressed row form.
+
+    Args:
+        mentions (list): (token, sentence, paragraph, chapter, character_id)
+            tuples as recorded by token_scan.MentionCollector
+        unit (str): "sentence", "paragraph" or "chapter"
+
+    Returns:
+        list: One row per unit that has mentions, in document order; each row
+            lists that unit's (token, character_id) mentions by token
+    """
+    column = {"sentence": 1, "paragraph": 2, "chapter": 3}[unit]
+    rows = defaultdict(list)
+    for mention in mentions:
+        rows[mention[column]].append((mention[0], mention[4]))
+    return [sorted(rows[key]) for key in sorted(rows)]
+
+def unit_cooccurrence(rows):
+    """
+    Pair counts from the product of the incidence matrix with its transpose.
+
+    The product is expanded row by row: each unit adds one to every pair of
+    distinct characters it contains, so the work is proportional to the
+    pairs actually present rather than to characters squared. Alongside the
+    count, each unit adds 1 / (1 + d) to the pair's weighted strength, where
+    d is the smallest token distance between the two characters' mentions
+    in that unit.
+
+    Returns:
+        tuple: (dict of pair -> count, dict of pair -> weighted strength),
+            with each pair's IDs in sorted order
+    """
+    counts = defaultdict(int)
+    weights = defaultdict(float)
+    for row in rows:
+        last_seen = {}
+        closest = {}
+        for token, character in row:
+            for other, other_token in last_seen.items():
+                if other == character:
+                    continue
+                pair = (character, other) if character < other else (other, character)
+                distance = token - other_token
+                if pair not in closest or distance < closest[pair]:
+                    closest[pair] = distance
+            last_seen[character] = token
+        for pair, distance in closest.items():
+            counts[pair] += 1
+            weights[pair] += 1 / (1 + distance)
+    return counts, weights
+
+def window_cooccurrence(mentions, window_tokens):
+    """
+    Pair counts over a sliding window: every two mentions of different
+    characters that start at most window_tokens apart count once, and add
+    1 / (1 + d) to the weighted strength for a distance of d tokens.
+
+    Returns:
+        tuple: (dict of pair -> count, dict of pair -> weighted strength)
+    """
+    ordered = sorted((mention[0], mention[4]) for mention in mentions)
+    counts = defaultdict(int)
+    weights = defaultdict(float)
+    start = 0
+    for position, (token, character) in enumerate(ordered):
+        while token - ordered[start][0] > window_tokens:
+            start += 1
+        for other_token, other in ordered[start:position]:
+            if other == character:
+                continue
+            pair = (character, other) if character < other else (other, character)
+            counts[pair] += 1
+            weights[pair] += 1 / (1 + token - other_token)
+    return counts, weights
+
+def cooccurrence(mentions, unit="paragraph", window_tokens=50):
+    """
+    Count how often each pair of characters co-occurs.
+
+    Args:
+        mentions (list): Mention tuples from token_scan.MentionCollector
+        unit (str): One of UNITS
+        window_tokens (int): Window size when unit is "window"
+
+    Returns:
+        tuple: (dict of pair -> count, dict of pair -> weighted strength)
+    """
+    if unit not in UNITS:
+        raise ValueError(f"Unknown co-occurrence unit {unit!r}; expected one of {UNITS}")
+    if unit == "window":
+        return window_cooccurrence(mentions, window_tokens)
+    return unit_cooccurrence(incidence_rows(mentions, unit))
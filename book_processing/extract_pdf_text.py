@@ -1,45 +1,161 @@
 import os
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import pypdf
 from pypdf import PdfReader
 
-def extract_text_from_pdf(pdf_path, output_path):
+from stage_cache import run_cached
+
+def extract_page_range(pdf_path, start, end):
+    """
+    Extract the text of a contiguous range of pages.
+
+    Each worker opens its own PdfReader, since reader objects cannot be
+    shared between processes.
+
+    Args:
+        pdf_path (str): Path to the PDF file
+        start (int): Index of the first page (inclusive)
+        end (int): Index of the last page (exclusive)
+
+    Returns:
+        list: Text of each page in the range, in page order
+    """
+    reader = PdfReader(pdf_path)
+    return [reader.pages[i].extract_text() for i in range(start, end)]
+
+def split_page_ranges(total_pages, jobs):
+    """Split the page indices into contiguous (start, end) ranges for the workers"""
+    # A few ranges per worker keeps the pool busy when some pages are slower than others
+    chunk_count = min(total_pages, jobs * 4)
+    if chunk_count == 0:
+        return []
+    chunk_size = -(-total_pages // chunk_count)
+    return [(start, min(start + chunk_size, total_pages))
+            for start in range(0, total_pages, chunk_size)]
+
+def page_index_path(text_path):
+    """Return the path of the page-offset index stored beside an extracted text file"""
+    root, _ = os.path.splitext(text_path)
+    return root + ".pages.json"
+
+def extract_text_from_pdf(pdf_path, output_path, jobs=1):
     """
     Extract text from a PDF file and save it to a text file.
-    
+
+    Pages are streamed to disk as they are extracted, and a page-offset
+    index is written beside the text file so later stages can read single
+    pages without parsing the PDF again (see iter_pages).
+
     Args:
         pdf_path (str): Path to the PDF file
         output_path (str): Path to save the extracted text
+        jobs (int): Number of worker processes; 1 extracts serially
     """
     print(f"Extracting text from {pdf_path}...")
-    
+
     # Create output directory if it doesn't exist
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    
+
     # Extract text from PDF
     reader = PdfReader(pdf_path)
-    text = ""
-    
+
     # Process each page
     total_pages = len(reader.pages)
     print(f"Processing {total_pages} pages...")
-    
-    for i, page in enumerate(reader.pages):
-        print(f"Processing page {i+1}/{total_pages}...", end="\r")
-        page_text = page.extract_text()
-        text += page_text + "\n\n"
-    
-    # Write text to file
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(text)
-    
-    print(f"\nExtracted {len(text)} characters to {output_path}")
+
+    if jobs > 1 and total_pages > 1:
+        ranges = split_page_ranges(total_pages, jobs)
+        print(f"Using {jobs} worker processes over {len(ranges)} page ranges...")
+        executor = ProcessPoolExecutor(max_workers=jobs)
+        # map() yields results in submission order, so pages stay in order
+        results = executor.map(extract_page_range,
+                               [pdf_path] * len(ranges),
+                               [start for start, _ in ranges],
+                               [end for _, end in ranges])
+        page_texts = (page_text for chunk in results for page_text in chunk)
+    else:
+        executor = None
+        page_texts = (page.extract_text() for page in reader.pages)
+
+    # Write each page as soon as it is available, recording its byte span
+    offsets = []
+    char_count = 0
+    try:
+        with open(output_path, "wb") as f:
+            for i, page_text in enumerate(page_texts):
+                print(f"Processing page {i+1}/{total_pages}...", end="\r")
+                data = page_text.encode("utf-8")
+                offsets.append([f.tell(), len(data)])
+                f.write(data + b"\n\n")
+                char_count += len(page_text) + 2
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    index = {
+        "source": os.path.basename(pdf_path),
+        "text": os.path.basename(output_path),
+        "page_count": total_pages,
+        "pages": offsets
+    }
+    with open(page_index_path(output_path), "w", encoding="utf-8") as f:
+        json.dump(index, f)
+
+    print(f"\nExtracted {char_count} characters to {output_path}")
     return output_path
 
+def load_page_index(text_path):
+    """Load the page-offset index for an extracted text file, or None if it is missing"""
+    index_path = page_index_path(text_path)
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def iter_pages(text_path):
+    """
+    Lazily read the pages of an extracted text file using its page index.
+
+    Only one page is held in memory at a time.
+
+    Args:
+        text_path (str): Path to a text file written by extract_text_from_pdf
+
+    Yields:
+        tuple: (page_number, page_text), with 1-based page numbers
+    """
+    index = load_page_index(text_path)
+    if index is None:
+        raise FileNotFoundError(f"No page index found for {text_path}")
+
+    with open(text_path, "rb") as f:
+        for page_idx, (offset, length) in enumerate(index["pages"]):
+            f.seek(offset)
+            yield page_idx + 1, f.read(length).decode("utf-8")
+
 if __name__ == "__main__":
-    pdf_path = "attached_assets/1984.pdf"
-    output_path = "book_processing/data/1984.txt"
-    
+    parser = argparse.ArgumentParser(description="Extract text from a PDF file")
+    parser.add_argument("--pdf", default="attached_assets/1984.pdf",
+                        help="Path to the PDF file")
+    parser.add_argument("--output", default="book_processing/data/1984.txt",
+                        help="Path to save the extracted text")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Number of worker processes (0 uses every CPU core)")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-extract even if the PDF is unchanged since the last run")
+    args = parser.parse_args()
+
     # Ensure the data directory exists
     os.makedirs("book_processing/data", exist_ok=True)
-    
-    extract_text_from_pdf(pdf_path, output_path)
-    print("Text extraction complete!")
\ No newline at end of file
+
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+    # The job count does not affect the output, so it is not part of the cache key
+    run_cached("extract",
+               [args.pdf],
+               {"extractor": "pypdf", "version": pypdf.__version__},
+               [args.output, page_index_path(args.output)],
+               lambda: extract_text_from_pdf(args.pdf, args.output, jobs=jobs),
+               force=args.force)
+    print("Text extraction complete!")
@@ -4,35 +4,87 @@ Extract_quotes.py - Extract meaningful quotes from 1984 PDF using extracted text
 """
 
 import os
+import argparse
+import heapq
 import json
 import re
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
-from pypdf import PdfReader
+
+from extract_pdf_text import extract_text_from_pdf, iter_pages, load_page_index
+from quote_dedup import QuoteDeduplicator, NEAR_DUPLICATE_THRESHOLD, fingerprint
+from quote_stream import (QUOTE_FORMATS, DEFAULT_QUOTE_FORMAT, external_sort_ndjson, iter_ndjson,
+                          ndjson_path, write_ndjson)
+from term_matcher import TermMatcher, hits_between
 
 # Set up paths
 SCRIPT_DIR = Path(__file__).parent
 PDF_PATH = SCRIPT_DIR.parent / "attached_assets" / "1984.pdf"
+TEXT_PATH = SCRIPT_DIR / "data" / "1984.txt"
 OUTPUT_DIR = SCRIPT_DIR / "output"
 QUOTES_OUTPUT = OUTPUT_DIR / "1984_quotes.json"
 EXPLORER_OUTPUT = OUTPUT_DIR / "1984_quote_explorer.json"
+INDEX_OUTPUT = OUTPUT_DIR / "1984_quote_index.json"
+SEARCH_INDEX_OUTPUT = OUTPUT_DIR / "1984_quote_search.json"
 
 # Create output directory if it doesn't exist
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-def extract_text_from_pdf(pdf_path):
-    """Extract raw text from a PDF file."""
-    try:
-        reader = PdfReader(pdf_path)
-        text = ""
-        for page_num, page in enumerate(reader.pages):
-            page_text = page.extract_text()
-            if page_text:
-                text += f"--- PAGE {page_num + 1} ---\n{page_text}\n\n"
-        return text
-    except Exception as e:
-        print(f"Error extracting text from PDF: {e}")
-        return None
+# Terms that make a sentence worth keeping even outside quotation marks
+QUOTE_KEYWORDS = [
+    "freedom", "war is peace", "ignorance is strength", "thought crime", 
+    "big brother", "ministry of truth", "ministry of love", "doublethink",
+    "newspeak", "memory hole", "telescreen", "thought police", "room 101",
+    "oceania", "eastasia", "eurasia", "proles", "brotherhood", "goldstein",
+    "thoughtcrime", "crimethink", "facecrime", "unperson", "vaporized",
+    "blackwhite", "bellyfeel", "oldspeak", "crimestop", "goodthink",
+    "Emmanuel", "Smith", "Julia"
+]
+
+# Names that attribute a quote to a character when they appear before it;
+# the first name in this order wins, and names are case-sensitive
+CHARACTER_PATTERNS = {
+    "Winston": 1,
+    "Smith": 1,
+    "Julia": 2,
+    "O'Brien": 3,
+    "Charrington": 4,
+    "Parsons": 5,
+    "Syme": 6,
+    "Ampleforth": 7,
+    "Big Brother": 8
+}
+
+# Keywords and character names compiled into one matcher
+QUOTE_TERMS = TermMatcher(QUOTE_KEYWORDS + list(CHARACTER_PATTERNS))
+KEYWORD_SET = set(QUOTE_KEYWORDS)
+SENTENCE_BREAK = re.compile(r'[.!?]+')
+
+# Pages sent to a worker process at a time
+PAGES_PER_TASK = 16
+
+# Batches in flight per worker process; bounds how far reading pages runs ahead of the workers
+TASKS_IN_FLIGHT_PER_JOB = 2
+
+def load_book_pages(pdf_path, text_path):
+    """
+    Return a lazy iterator over the pages of the book.
+
+    Reuses the text and page index written by extract_pdf_text when they are
+    newer than the PDF, so the PDF is only parsed once per run.
+    """
+    index = load_page_index(text_path)
+    if (index is None or not os.path.exists(text_path)
+            or os.path.getmtime(text_path) < os.path.getmtime(pdf_path)):
+        try:
+            extract_text_from_pdf(str(pdf_path), str(text_path))
+        except Exception as e:
+            print(f"Error extracting text from PDF: {e}")
+            return None
+    return iter_pages(str(text_path))
 
 def prepare_chapter_mapping():
     """Create a mapping of chapter indicators to chapter numbers."""
@@ -62,20 +114,21 @@ def prepare_chapter_mapping():
     
     return chapter_map
 
-def find_potential_quotes(text, min_length=30, max_length=500):
-    """Find potential quotes using some heuristics."""
-    # Split text into pages
-    pages = re.split(r'--- PAGE \d+ ---', text)
-    
-    chapter_map = prepare_chapter_mapping()
+def chapter_pages(pages, chapter_map=None):
+    """
+    Tag each page with the chapter it belongs to, skipping near-empty pages.
+
+    Chapter headings are found in page order, since a page belongs to the
+    last chapter heading seen before or on it.
+
+    Yields:
+        tuple: (page_number, page_text, chapter)
+    """
+    if chapter_map is None:
+        chapter_map = prepare_chapter_mapping()
     current_chapter = 1
-    current_page = 1
-    
-    quotes = []
-    
-    for page_idx, page_text in enumerate(pages[1:], 1):  # Skip the first empty split
+    for page_number, page_text in pages:
         lines = page_text.strip().split('\n')
-        page_number = page_idx
         
         # Check for chapter headings
         for line in lines:
@@ -87,197 +140,318 @@ def find_potential_quotes(text, min_length=30, max_length=500):
         # Skip short pages (likely chapter transitions or blank pages)
         if len(page_text.strip()) < 100:
             continue
-        
-        # First, look for text in quotation marks
-        quote_patterns = [
-            r'"([^"]{' + str(min_length) + ',' + str(max_length) + '})"',  # Double quotes
-            r"'([^']{" + str(min_length) + ',' + str(max_length) + "})'",  # Single quotes
-        ]
-        
-        for pattern in quote_patterns:
-            for match in re.finditer(pattern, page_text):
-                quote_text = match.group(1).strip()
-                
-                # Skip quotes that are too short or too long after stripping
-                if len(quote_text) < min_length or len(quote_text) > max_length:
-                    continue
+        yield page_number, page_text, current_chapter
+
+def page_quote_candidates(page_number, page_text, chapter, min_length=30, max_length=500):
+    """
+    Find the candidate quotes on one page.
+
+    Candidates are returned in the order find_potential_quotes considers
+    them, before duplicates are removed and without IDs, so pages can be
+    processed independently.
+
+    Returns:
+        list: Quote dictionaries without an "id"
+    """
+    candidates = []
+    
+    # First, look for text in quotation marks
+    quote_patterns = [
+        r'"([^"]{' + str(min_length) + ',' + str(max_length) + '})"',  # Double quotes
+        r"'([^']{" + str(min_length) + ',' + str(max_length) + "})'",  # Single quotes
+    ]
+    
+    for pattern in quote_patterns:
+        for match in re.finditer(pattern, page_text):
+            quote_text = match.group(1).strip()
+            
+            # Skip quotes that are too short or too long after stripping
+            if len(quote_text) < min_length or len(quote_text) > max_length:
+                continue
+            
+            # Extract some context (text before and after the quote)
+            start_pos = max(0, match.start() - 100)
+            end_pos = min(len(page_text), match.end() + 100)
+            context = page_text[start_pos:end_pos].strip()
+            
+            # Determine significance (somewhat arbitrary for now)
+            # Longer quotes might be more significant, especially in key chapters
+            significance = min(5, max(1, int(len(quote_text) / 100) + 2))
+            
+            # Adjust significance based on chapter (middle chapters often contain key revelations)
+            if 8 <= chapter <= 16:
+                significance = min(5, significance + 1)
+            
+            # Check for character names before the quote to associate it
+            names_before = {term for _, term, found in QUOTE_TERMS.find(context[:context.find(quote_text)])
+                            if found == term and term in CHARACTER_PATTERNS}
+            character_id = next((char_id for name, char_id in CHARACTER_PATTERNS.items()
+                                 if name in names_before), None)
+            
+            candidates.append({
+                "bookId": 1,  # 1984 is book ID 1
+                "characterId": character_id,
+                "chapterId": chapter,
+                "page": page_number,
+                "text": quote_text,
+                "context": context,
+                "significance": significance,
+                "extractionMethod": "pdf_extract"
+            })
+    
+    # Look for significant statements even if not in quotes
+    # This is more complex and prone to errors, but can find important quotes
+    
+    # Find every keyword on the page once, then split into sentences and process each
+    page_hits = QUOTE_TERMS.find(page_text)
+    breaks = [match.span() for match in SENTENCE_BREAK.finditer(page_text)]
+    sentence_starts = [0] + [end for _, end in breaks]
+    sentence_ends = [start for start, _ in breaks] + [len(page_text)]
+    for sentence_start, sentence_end in zip(sentence_starts, sentence_ends):
+        # Only consider sentences of appropriate length
+        sentence = page_text[sentence_start:sentence_end].strip()
+        if min_length <= len(sentence) <= max_length:
+            # Check if sentence contains significant keywords or phrases
+            keywords_found = {term for _, term, _ in hits_between(page_hits, sentence_start, sentence_end)
+                              if term in KEYWORD_SET}
+            
+            if keywords_found:
+                # Determine significance based on keywords and length
+                keyword_count = len(keywords_found)
+                significance = min(5, max(1, int(keyword_count / 2) + 2))
                 
-                # Basic deduplication - check if similar quote already exists
-                if not any(q["text"] == quote_text for q in quotes):
-                    # Extract some context (text before and after the quote)
-                    start_pos = max(0, match.start() - 100)
-                    end_pos = min(len(page_text), match.end() + 100)
+                # Extract some context
+                sentence_start = page_text.find(sentence)
+                if sentence_start >= 0:
+                    start_pos = max(0, sentence_start - 50)
+                    end_pos = min(len(page_text), sentence_start + len(sentence) + 50)
                     context = page_text[start_pos:end_pos].strip()
-                    
-                    # Determine significance (somewhat arbitrary for now)
-                    # Longer quotes might be more significant, especially in key chapters
-                    significance = min(5, max(1, int(len(quote_text) / 100) + 2))
-                    
-                    # Adjust significance based on chapter (middle chapters often contain key revelations)
-                    if 8 <= current_chapter <= 16:
-                        significance = min(5, significance + 1)
-                    
-                    # Check for character names to associate the quote
-                    character_id = None
-                    character_patterns = {
-                        "Winston": 1,
-                        "Smith": 1,
-                        "Julia": 2,
-                        "O'Brien": 3,
-                        "Charrington": 4,
-                        "Parsons": 5,
-                        "Syme": 6,
-                        "Ampleforth": 7,
-                        "Big Brother": 8
-                    }
-                    
-                    for name, char_id in character_patterns.items():
-                        if name in context[:context.find(quote_text)]:
-                            character_id = char_id
-                            break
-                    
-                    quotes.append({
-                        "id": len(quotes) + 1,
-                        "bookId": 1,  # 1984 is book ID 1
-                        "characterId": character_id,
-                        "chapterId": current_chapter,
-                        "page": page_number,
-                        "text": quote_text,
-                        "context": context,
-                        "significance": significance,
-                        "extractionMethod": "pdf_extract"
-                    })
-        
-        # Look for significant statements even if not in quotes
-        # This is more complex and prone to errors, but can find important quotes
-        
-        # Split into sentences and process each
-        sentences = re.split(r'[.!?]+', page_text)
-        for sentence in sentences:
-            # Only consider sentences of appropriate length
-            sentence = sentence.strip()
-            if min_length <= len(sentence) <= max_length:
-                # Check if sentence contains significant keywords or phrases
-                keywords = [
-                    "freedom", "war is peace", "ignorance is strength", "thought crime", 
-                    "big brother", "ministry of truth", "ministry of love", "doublethink",
-                    "newspeak", "memory hole", "telescreen", "thought police", "room 101",
-                    "oceania", "eastasia", "eurasia", "proles", "brotherhood", "goldstein",
-                    "thoughtcrime", "crimethink", "facecrime", "unperson", "vaporized",
-                    "blackwhite", "bellyfeel", "oldspeak", "crimestop", "goodthink",
-                    "Emmanuel", "Smith", "Julia"
-                ]
+                else:
+                    context = None
                 
-                if any(keyword.lower() in sentence.lower() for keyword in keywords):
-                    # Basic deduplication - check if similar sentence already exists
-                    if not any(q["text"] == sentence for q in quotes):
-                        # Determine significance based on keywords and length
-                        keyword_count = sum(1 for kw in keywords if kw.lower() in sentence.lower())
-                        significance = min(5, max(1, int(keyword_count / 2) + 2))
-                        
-                        # Extract some context
-                        sentence_start = page_text.find(sentence)
-                        if sentence_start >= 0:
-                            start_pos = max(0, sentence_start - 50)
-                            end_pos = min(len(page_text), sentence_start + len(sentence) + 50)
-                            context = page_text[start_pos:end_pos].strip()
-                        else:
-                            context = None
-                        
-                        quotes.append({
-                            "id": len(quotes) + 1,
-                            "bookId": 1,  # 1984 is book ID 1
-                            "characterId": None,  # Can't reliably determine for non-quoted text
-                            "chapterId": current_chapter,
-                            "page": page_number,
-                            "text": sentence,
-                            "context": context,
-                            "significance": significance,
-                            "extractionMethod": "keyword_extract"
-                        })
+                candidates.append({
+                    "bookId": 1,  # 1984 is book ID 1
+                    "characterId": None,  # Can't reliably determine for non-quoted text
+                    "chapterId": chapter,
+                    "page": page_number,
+                    "text": sentence,
+                    "context": context,
+                    "significance": significance,
+                    "extractionMethod": "keyword_extract"
+                })
+    
+    return candidates
+
+def page_batch_candidates(batch, min_length, max_length, near_duplicate_threshold):
+    """
+    Worker task: candidates for a batch of (page_number, page_text, chapter) tuples.
+
+    With a near-duplicate threshold each candidate is returned with its
+    quote_dedup fingerprint, so the shingling and MinHash work also happens
+    in the workers and the merge only does lookups.
+
+    Returns:
+        list: (candidate, fingerprint or None) pairs in page order
+    """
+    results = []
+    for page_number, page_text, chapter in batch:
+        for candidate in page_quote_candidates(page_number, page_text, chapter, min_length, max_length):
+            quote_fingerprint = fingerprint(candidate["text"]) if near_duplicate_threshold is not None else None
+            results.append((candidate, quote_fingerprint))
+    return results
+
+def batched(items, size):
+    """Group an iterable into lists of up to size items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def map_in_order(executor, fn, items, window, *args):
+    """
+    Yield fn(item, *args) for each item, in order, computed by executor.
+
+    Unlike executor.map, which submits every item up front, at most window
+    items are submitted and not yet yielded, so items are read lazily and
+    finished results do not pile up behind a slow one.
+    """
+    in_flight = deque()
+    for item in items:
+        if len(in_flight) >= window:
+            yield in_flight.popleft().result()
+        in_flight.append(executor.submit(fn, item, *args))
+    while in_flight:
+        yield in_flight.popleft().result()
+
+def merge_quote_candidates(candidate_batches, near_duplicate_threshold=NEAR_DUPLICATE_THRESHOLD):
+    """
+    Drop repeated candidates and number the rest.
+
+    Candidates must arrive in page order: the first of a set of duplicates
+    is kept and IDs count up in that order, so the result does not depend
+    on how pages were split between workers.
+
+    Args:
+        candidate_batches: Iterable of page_batch_candidates results
+
+    Yields:
+        dict: Quote dictionaries in page order
+    """
+    quote_count = 0
+    seen = QuoteDeduplicator(near_duplicate_threshold)
+    for batch in candidate_batches:
+        for candidate, quote_fingerprint in batch:
+            # Skip quotes already found, or near-identical to one already found
+            if seen.add(candidate["text"], quote_fingerprint):
+                quote_count += 1
+                yield {"id": quote_count, **candidate}
+
+def iter_potential_quotes(pages, min_length=30, max_length=500,
+                          near_duplicate_threshold=NEAR_DUPLICATE_THRESHOLD, jobs=1):
+    """
+    Lazily find potential quotes, in page order.
+
+    Pages are tagged with their chapter in order, then searched for
+    candidates in batches; with jobs > 1 the batches are searched by a
+    process pool, with at most TASKS_IN_FLIGHT_PER_JOB batches per job
+    submitted ahead of the merge. Candidates are merged in page order, so the IDs and the
+    quotes are the same whatever the number of jobs.
+
+    Args:
+        pages: Iterable of (page_number, page_text) tuples, such as the
+            lazy reader returned by load_book_pages
+        near_duplicate_threshold (float): Skip quotes whose word shingles
+            overlap an earlier quote's by at least this much (see
+            quote_dedup.py); None skips only exact repeats
+        jobs (int): Number of worker processes; 1 searches serially
+    """
+    batches = batched(chapter_pages(pages), PAGES_PER_TASK)
+    task_args = (repeat(min_length), repeat(max_length), repeat(near_duplicate_threshold))
+    if jobs <= 1:
+        yield from merge_quote_candidates(map(page_batch_candidates, batches, *task_args),
+                                          near_duplicate_threshold)
+        return
+    
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        # Results come back in submission order, so candidates stay in page order
+        candidate_batches = map_in_order(executor, page_batch_candidates, batches,
+                                         jobs * TASKS_IN_FLIGHT_PER_JOB,
+                                         min_length, max_length, near_duplicate_threshold)
+        yield from merge_quote_candidates(candidate_batches, near_duplicate_threshold)
+
+def find_potential_quotes(pages, min_length=30, max_length=500,
+                          near_duplicate_threshold=NEAR_DUPLICATE_THRESHOLD, jobs=1):
+    """
+    Find potential quotes using some heuristics.
+
+    Takes the same arguments as iter_potential_quotes.
+
+    Returns:
+        list: Quote dictionaries sorted by significance
+    """
+    quotes = list(iter_potential_quotes(pages, min_length, max_length, near_duplicate_threshold, jobs))
     
     # Sort quotes by significance (descending)
     quotes.sort(key=lambda q: q["significance"], reverse=True)
     
     return quotes
 
-def process_quotes_for_explorer(quotes):
-    """Process the extracted quotes to create the explorer data structure."""
-    
-    # Define the main themes in 1984
-    themes = {
-        "Totalitarianism": [
-            "big brother", "party", "control", "power", "surveillance", 
-            "telescreens", "thought police", "ministry", "victory"
-        ],
-        "Psychological Manipulation": [
-            "doublethink", "newspeak", "reality control", "memory hole", 
-            "vaporized", "unperson", "confession", "torture", "room 101", "pain"
-        ],
-        "Control of Information": [
-            "ministry of truth", "records", "memory hole", "newspeak", 
-            "dictionary", "alter", "rewrite", "history", "facts", "documents"
-        ],
-        "Individual vs. Collective": [
-            "proles", "brotherhood", "rebellion", "resist", "freedom", 
-            "individual", "humanity", "solidarity", "alone", "masses"
-        ],
-        "Surveillance": [
-            "telescreen", "watched", "spies", "thought police", "hidden", 
-            "microphone", "eyes", "ears", "patrol", "observe"
-        ],
-        "Identity and Existence": [
-            "exist", "existed", "memory", "proof", "photograph", "diary", 
-            "remember", "forget", "self", "identity", "persist"
-        ]
-    }
-    
-    # Define the main characters
-    characters = {
-        "Winston Smith": 1,
-        "Julia": 2, 
-        "O'Brien": 3,
-        "Mr. Charrington": 4,
-        "Parsons": 5,
-        "Syme": 6,
-        "Ampleforth": 7,
-        "Big Brother": 8,
-    }
-    
-    # Create initial structure
-    explorer_data = {
-        "quotesByTheme": {theme: [] for theme in themes},
-        "quotesByCharacter": {char: [] for char in characters},
-        "mostSignificantQuotes": []
-    }
-    
-    # Add "Narrator" for quotes without an assigned character
-    explorer_data["quotesByCharacter"]["Narrator"] = []
-    
+# The main themes in 1984 and the keywords that place a quote under each
+EXPLORER_THEMES = {
+    "Totalitarianism": [
+        "big brother", "party", "control", "power", "surveillance", 
+        "telescreens", "thought police", "ministry", "victory"
+    ],
+    "Psychological Manipulation": [
+        "doublethink", "newspeak", "reality control", "memory hole", 
+        "vaporized", "unperson", "confession", "torture", "room 101", "pain"
+    ],
+    "Control of Information": [
+        "ministry of truth", "records", "memory hole", "newspeak", 
+        "dictionary", "alter", "rewrite", "history", "facts", "documents"
+    ],
+    "Individual vs. Collective": [
+        "proles", "brotherhood", "rebellion", "resist", "freedom", 
+        "individual", "humanity", "solidarity", "alone", "masses"
+    ],
+    "Surveillance": [
+        "telescreen", "watched", "spies", "thought police", "hidden", 
+        "microphone", "eyes", "ears", "patrol", "observe"
+    ],
+    "Identity and Existence": [
+        "exist", "existed", "memory", "proof", "photograph", "diary", 
+        "remember", "forget", "self", "identity", "persist"
+    ]
+}
+
+# The main characters in the explorer, by the character IDs quotes are attributed to
+EXPLORER_CHARACTERS = {
+    "Winston Smith": 1,
+    "Julia": 2, 
+    "O'Brien": 3,
+    "Mr. Charrington": 4,
+    "Parsons": 5,
+    "Syme": 6,
+    "Ampleforth": 7,
+    "Big Brother": 8,
+}
+
+# Quotes listed under mostSignificantQuotes
+MOST_SIGNIFICANT_LIMIT = 50
+
+# Theme keywords compiled into one matcher, so each quote is scanned once
+THEME_TERMS = TermMatcher(keyword for keywords in EXPLORER_THEMES.values() for keyword in keywords)
+THEMES_BY_KEYWORD = {}
+for theme_name, keywords in EXPLORER_THEMES.items():
+    for keyword in keywords:
+        THEMES_BY_KEYWORD.setdefault(keyword, []).append(theme_name)
+
+CHARACTER_NAMES = {char_id: name for name, char_id in EXPLORER_CHARACTERS.items()}
+
+def quote_themes(text):
+    """The themes whose keywords appear in a quote, in EXPLORER_THEMES order"""
+    found = {theme_name for _, keyword, _ in THEME_TERMS.find(text)
+             for theme_name in THEMES_BY_KEYWORD[keyword]}
+    return [theme_name for theme_name in EXPLORER_THEMES if theme_name in found]
+
+def character_name(character_id, default="Narrator"):
+    """The explorer name for a quote's characterId"""
+    if character_id is None:
+        return "Narrator"
+    return CHARACTER_NAMES.get(character_id, default)
+
+def explorer_records(quotes):
+    """
+    Place each quote in the sections of the explorer data structure.
+
+    Yields:
+        tuple: (section, key, entry), where section is "quotesByTheme",
+            "quotesByCharacter" or "mostSignificantQuotes" and key is the
+            theme or character name (None for mostSignificantQuotes)
+    """
     # Process each quote
     for quote in quotes:
-        quote_theme_names = []
-        
         # Determine themes for this quote
-        for theme_name, keywords in themes.items():
-            if any(keyword.lower() in quote["text"].lower() for keyword in keywords):
-                quote_theme_names.append(theme_name)
-                
-                # Add to theme's quotes
-                theme_quote = {
-                    "id": quote["id"],
-                    "text": quote["text"],
-                    "chapter": quote["chapterId"],
-                    "significance": quote["significance"]
-                }
-                
-                # Add character if available
-                if quote["characterId"] is not None:
-                    char_id = quote["characterId"]
-                    char_name = next((name for name, id in characters.items() if id == char_id), "Unknown")
-                    theme_quote["character"] = char_name
-                
-                explorer_data["quotesByTheme"][theme_name].append(theme_quote)
+        quote_theme_names = quote_themes(quote["text"])
+        
+        for theme_name in quote_theme_names:
+            # Add to theme's quotes
+            theme_quote = {
+                "id": quote["id"],
+                "text": quote["text"],
+                "chapter": quote["chapterId"],
+                "significance": quote["significance"]
+            }
+            
+            # Add character if available
+            if quote["characterId"] is not None:
+                theme_quote["character"] = character_name(quote["characterId"], "Unknown")
+            
+            yield "quotesByTheme", theme_name, theme_quote
         
         # If no themes detected, add to "Other" theme
         if not quote_theme_names:
@@ -285,10 +459,7 @@ def process_quotes_for_explorer(quotes):
             continue
         
         # Determine character for this quote
-        char_name = "Narrator"  # Default
-        if quote["characterId"] is not None:
-            char_id = quote["characterId"]
-            char_name = next((name for name, id in characters.items() if id == char_id), "Narrator")
+        char_name = character_name(quote["characterId"])
         
         # Add to character's quotes
         character_quote = {
@@ -298,7 +469,7 @@ def process_quotes_for_explorer(quotes):
             "chapter": quote["chapterId"],
             "significance": quote["significance"]
         }
-        explorer_data["quotesByCharacter"][char_name].append(character_quote)
+        yield "quotesByCharacter", char_name, character_quote
         
         # Add to most significant quotes if significance >= 4
         if quote["significance"] >= 4:
@@ -314,53 +485,239 @@ def process_quotes_for_explorer(quotes):
             if char_name != "Narrator":
                 significant_quote["character"] = char_name
                 
-            explorer_data["mostSignificantQuotes"].append(significant_quote)
+            yield "mostSignificantQuotes", None, significant_quote
+
+def process_quotes_for_explorer(quotes):
+    """Process the extracted quotes to create the explorer data structure."""
+    
+    # Create initial structure
+    explorer_data = {
+        "quotesByTheme": {theme: [] for theme in EXPLORER_THEMES},
+        "quotesByCharacter": {char: [] for char in EXPLORER_CHARACTERS},
+        "mostSignificantQuotes": []
+    }
+    
+    # Add "Narrator" for quotes without an assigned character
+    explorer_data["quotesByCharacter"]["Narrator"] = []
+    
+    for section, key, entry in explorer_records(quotes):
+        if key is None:
+            explorer_data[section].append(entry)
+        else:
+            explorer_data[section][key].append(entry)
     
     # Sort most significant quotes
     explorer_data["mostSignificantQuotes"].sort(key=lambda q: q["significance"], reverse=True)
     
     # Limit to top 50
-    explorer_data["mostSignificantQuotes"] = explorer_data["mostSignificantQuotes"][:50]
+    explorer_data["mostSignificantQuotes"] = explorer_data["mostSignificantQuotes"][:MOST_SIGNIFICANT_LIMIT]
     
     return explorer_data
 
-def main():
-    print(f"Extracting quotes from {PDF_PATH}...")
+def build_quote_index(quotes, source_file=None):
+    """
+    Inverted indexes from explorer facets to quote IDs.
+
+    Covers the quotes the explorer lists, those with at least one theme.
+    Each posting list holds IDs from the quotes file in ascending order,
+    so the server can filter or intersect facets without scanning quotes.
+
+    Args:
+        source_file (str): Name of the quotes file the IDs refer to; it is
+            recorded with the number of quotes in it, so readers can tell
+            when the index and the quotes file are from different runs
+
+    Returns:
+        dict: "source" ({"file", "quoteCount"}), "quoteCount" (indexed
+            quotes), then "themes", "characters", "chapters" and
+            "significance" (keyed by the 1-5 rating), each mapping a name
+            or number (as a string) to a posting list
+    """
+    index = {
+        "themes": {theme: [] for theme in EXPLORER_THEMES},
+        "characters": {char: [] for char in EXPLORER_CHARACTERS},
+        "chapters": {},
+        "significance": {}
+    }
+    index["characters"]["Narrator"] = []
+    
+    quote_count = 0
+    source_count = 0
+    for quote in quotes:
+        source_count += 1
+        quote_theme_names = quote_themes(quote["text"])
+        if not quote_theme_names:
+            continue
+        quote_count += 1
+        quote_id = quote["id"]
+        for theme_name in quote_theme_names:
+            index["themes"][theme_name].append(quote_id)
+        index["characters"][character_name(quote["characterId"])].append(quote_id)
+        index["chapters"].setdefault(quote["chapterId"], []).append(quote_id)
+        index["significance"].setdefault(quote["significance"], []).append(quote_id)
+    
+    for facet in ("chapters", "significance"):
+        index[facet] = {str(key): index[facet][key] for key in sorted(index[facet])}
+    for postings in index.values():
+        for quote_ids in postings.values():
+            quote_ids.sort()
+    return {"source": {"file": source_file, "quoteCount": source_count},
+            "quoteCount": quote_count, **index}
+
+def write_explorer_ndjson(quotes, path):
+    """
+    Write the explorer data as JSON Lines, one quote placement per line.
+
+    The first line lists the theme and character names, as
+    {"themes": [...], "characters": [...]}. Each following line is
+    {"section": ..., "key": ..., "quote": ...} in the order
+    process_quotes_for_explorer fills its lists, and the
+    mostSignificantQuotes lines come last, in the same order. Only those
+    top quotes are held in memory (in a bounded heap), so quotes can be
+    read from a stream.
+
+    Returns:
+        int: The number of lines written
+    """
+    top = []
+    
+    def lines():
+        yield {"themes": list(EXPLORER_THEMES), "characters": list(EXPLORER_CHARACTERS) + ["Narrator"]}
+        for arrival, (section, key, entry) in enumerate(explorer_records(quotes)):
+            if key is not None:
+                yield {"section": section, "key": key, "quote": entry}
+                continue
+            # Keep the highest significance, earliest first among ties, as the stable sort would
+            heapq.heappush(top, (entry["significance"], -arrival, entry))
+            if len(top) > MOST_SIGNIFICANT_LIMIT:
+                heapq.heappop(top)
+        for _, _, entry in sorted(top, key=lambda item: item[:2], reverse=True):
+            yield {"section": "mostSignificantQuotes", "quote": entry}
     
-    if not PDF_PATH.exists():
-        print(f"Error: PDF file not found at {PDF_PATH}")
+    return write_ndjson(lines(), path)
+
+def save_quote_index(quotes, index_output, quotes_file):
+    """Build the quote index for the quotes saved in quotes_file and save it as JSON"""
+    quote_index = build_quote_index(quotes, os.path.basename(str(quotes_file)))
+    with open(index_output, 'w') as f:
+        json.dump(quote_index, f)
+    print(f"Quote index saved to {index_output}")
+    return quote_index
+
+def write_quotes_ndjson(pages, quotes_output, explorer_output, index_output=INDEX_OUTPUT, jobs=1):
+    """
+    Stream quotes to JSON Lines files without holding them in memory.
+
+    Quotes are written to <quotes>.found.ndjson as they are found, so other
+    tools can follow that file during extraction. It is then sorted by
+    significance on disk into <quotes>.ndjson, in the same order as the
+    JSON output, and the explorer lines are written to <explorer>.ndjson
+    from the sorted file, followed by the quote index.
+
+    Returns:
+        int: The number of quotes found
+    """
+    found_path = ndjson_path(quotes_output, ".found")
+    sorted_path = ndjson_path(quotes_output)
+    explorer_path = ndjson_path(explorer_output)
+    
+    quote_count = write_ndjson(iter_potential_quotes(pages, jobs=jobs), found_path)
+    print(f"Found {quote_count} potential quotes.")
+    if not quote_count:
+        os.remove(found_path)
+        return 0
+    
+    external_sort_ndjson(found_path, sorted_path, key=lambda q: -q["significance"])
+    os.remove(found_path)
+    print(f"Raw quotes saved to {sorted_path}")
+    
+    write_explorer_ndjson(iter_ndjson(sorted_path), explorer_path)
+    print(f"Explorer data saved to {explorer_path}")
+    
+    save_quote_index(iter_ndjson(sorted_path), index_output, sorted_path)
+    return quote_count
+
+def main(pdf_path=PDF_PATH, text_path=TEXT_PATH, quotes_output=QUOTES_OUTPUT,
+         explorer_output=EXPLORER_OUTPUT, index_output=INDEX_OUTPUT,
+         search_index_output=SEARCH_INDEX_OUTPUT, jobs=1, output_format=DEFAULT_QUOTE_FORMAT):
+    """
+    Extract quotes from a book and save them with the explorer data.
+
+    The full-text search index built from the previous quotes is deleted,
+    since its quote IDs no longer match; the pipeline's search_index stage
+    or quote_search.py rebuilds it.
+
+    Args:
+        jobs (int): Worker processes for finding quotes
+        output_format (str): One of quote_stream.QUOTE_FORMATS; "ndjson"
+            writes .ndjson files beside the .json output paths
+
+    Returns:
+        The list of quotes, or the number of quotes for "ndjson"
+    """
+    pdf_path = Path(pdf_path)
+    print(f"Extracting quotes from {pdf_path}...")
+    
+    if not pdf_path.exists():
+        print(f"Error: PDF file not found at {pdf_path}")
         sys.exit(1)
     
-    # Extract text from PDF
-    text = extract_text_from_pdf(PDF_PATH)
-    if not text:
+    # Read pages lazily from the shared extraction artifact
+    pages = load_book_pages(pdf_path, text_path)
+    if pages is None:
         print("Failed to extract text from the PDF.")
         sys.exit(1)
     
-    print(f"Extracted {len(text)} characters of text.")
+    if os.path.exists(search_index_output):
+        os.remove(search_index_output)
+        print(f"Removed the search index for the previous quotes, {search_index_output}")
+    
+    if output_format == "ndjson":
+        quote_count = write_quotes_ndjson(pages, quotes_output, explorer_output, index_output, jobs=jobs)
+        if not quote_count:
+            print("No quotes found. Exiting.")
+            sys.exit(1)
+        print("Quote extraction completed successfully!")
+        return quote_count
     
     # Find potential quotes
-    quotes = find_potential_quotes(text)
+    quotes = find_potential_quotes(pages, jobs=jobs)
     print(f"Found {len(quotes)} potential quotes.")
     
     if not quotes:
         print("No quotes found. Exiting.")
         sys.exit(1)
     
+    # Drop line-delimited outputs left by an earlier streaming run, so readers
+    # that prefer them do not pick up stale quotes
+    for stale_path in (ndjson_path(quotes_output), ndjson_path(explorer_output)):
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+    
     # Save raw quotes
-    with open(QUOTES_OUTPUT, 'w') as f:
+    with open(quotes_output, 'w') as f:
         json.dump(quotes, f, indent=2)
-    print(f"Raw quotes saved to {QUOTES_OUTPUT}")
+    print(f"Raw quotes saved to {quotes_output}")
     
     # Process for explorer view
     explorer_data = process_quotes_for_explorer(quotes)
     
     # Save explorer data
-    with open(EXPLORER_OUTPUT, 'w') as f:
+    with open(explorer_output, 'w') as f:
         json.dump(explorer_data, f, indent=2)
-    print(f"Explorer data saved to {EXPLORER_OUTPUT}")
+    print(f"Explorer data saved to {explorer_output}")
+    
+    # Save the facet indexes the server filters with
+    save_quote_index(quotes, index_output, quotes_output)
     
     print("Quote extraction completed successfully!")
+    return quotes
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Extract quotes from the book")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Number of worker processes (0 uses every CPU core)")
+    parser.add_argument("--format", choices=QUOTE_FORMATS, default=DEFAULT_QUOTE_FORMAT,
+                        help="Write indented JSON, or stream JSON Lines (.ndjson) files")
+    args = parser.parse_args()
+    main(jobs=args.jobs if args.jobs > 0 else os.cpu_count(), output_format=args.format)
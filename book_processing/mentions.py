@@ -0,0 +1,118 @@
+from array import array
+
+from booknlp_tables import Vocabulary
+
+# How character mentions are written to characters.json:
+#   "objects" - one {"text", "type", "start_token", "end_token"} dict per mention
+#   "arrays"  - parallel arrays of token offsets and string-table codes
+#   "none"    - mentions are left out; mention_count is kept
+MENTION_FORMATS = ("objects", "arrays", "none")
+DEFAULT_MENTION_FORMAT = "arrays"
+
+class MentionList:
+    """
+    The mentions of one character, stored as parallel arrays.
+
+    Start and end tokens are integer arrays; mention types and texts are
+    codes into small string tables, so a pronoun repeated a thousand times
+    is stored once.
+    """
+
+    __slots__ = ("starts", "ends", "type_codes", "text_codes", "types", "texts")
+
+    def __init__(self):
+        self.starts = array("q")
+        self.ends = array("q")
+        self.type_codes = array("l")
+        self.text_codes = array("l")
+        self.types = Vocabulary()
+        self.texts = Vocabulary()
+
+    def append(self, start_token, end_token, mention_type, text):
+        self.starts.append(start_token)
+        self.ends.append(end_token)
+        self.type_codes.append(self.types.encode(mention_type))
+        self.text_codes.append(self.texts.encode(text))
+
+    def extend(self, other):
+        """Append all of another MentionList's mentions"""
+        self.starts.extend(other.starts)
+        self.ends.extend(other.ends)
+        self.type_codes.extend(self.types.encode(other.types.decode(code)) for code in other.type_codes)
+        self.text_codes.extend(self.texts.encode(other.texts.decode(code)) for code in other.text_codes)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        """Yield each mention as a dict in the "objects" format"""
+        for start, end, type_code, text_code in zip(self.starts, self.ends,
+                                                    self.type_codes, self.text_codes):
+            yield {
+                "text": self.texts.decode(text_code),
+                "type": self.types.decode(type_code),
+                "start_token": str(start),
+                "end_token": str(end)
+            }
+
+    def to_json(self, mention_format):
+        if mention_format == "objects":
+            return list(self)
+        return {
+            "start_token": self.starts.tolist(),
+            "end_token": self.ends.tolist(),
+            "type": self.type_codes.tolist(),
+            "text": self.text_codes.tolist(),
+            "types": self.types.strings,
+            "texts": self.texts.strings
+        }
+
+def characters_to_json(characters, mention_format=DEFAULT_MENTION_FORMAT):
+    """
+    Copy character dictionaries for saving, converting each MentionList.
+
+    Args:
+        characters (list): Character dictionaries with a "mentions" MentionList
+        mention_format (str): One of MENTION_FORMATS
+
+    Returns:
+        list: JSON-serializable character dictionaries
+    """
+    if mention_format not in MENTION_FORMATS:
+        raise ValueError(f"Unknown mention format {mention_format!r}; expected one of {MENTION_FORMATS}")
+    result = []
+    for character in characters:
+        character = dict(character)
+        if mention_format == "none":
+            character.pop("mentions", None)
+        else:
+            character["mentions"] = character["mentions"].to_json(mention_format)
+        result.append(character)
+    return result
+
+def json_indent(mention_format):
+    """Indentation for a characters.json file; the compact formats are written on one line"""
+    return 2 if mention_format == "objects" else None
+
+def iter_mentions(mentions):
+    """
+    Yield mention dicts from a characters.json "mentions" value in any format.
+
+    Args:
+        mentions: A list of mention dicts, a dict of parallel arrays, or None
+    """
+    if not mentions:
+        return
+    if isinstance(mentions, list):
+        yield from mentions
+        return
+    types = mentions["types"]
+    texts = mentions["texts"]
+    for start, end, type_code, text_code in zip(mentions["start_token"], mentions["end_token"],
+                                                mentions["type"], mentions["text"]):
+        yield {
+            "text": texts[text_code],
+            "type": types[type_code],
+            "start_token": str(start),
+            "end_token": str(end)
+        }
@@ -0,0 +1,107 @@
+import os
+import json
+import time
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None if unavailable)"""
+    if resource is None:
+        return None
+    # ru_maxrss is reported in KB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def children_cpu_seconds():
+    """CPU time used by finished child processes, such as extraction or BookNLP workers"""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+# What each per-stage measurement covers, written into pipeline_metrics.json.
+# Only wall time and thread CPU time belong to one stage; the rest are read
+# from the whole process and are approximate when concurrent_stages is not empty
+METRIC_SCOPES = {
+    "wall_seconds": "stage",
+    "thread_cpu_seconds": "stage (its own thread only; threads it starts are not counted)",
+    "process_child_cpu_seconds": "process-wide: child processes of any stage reaped while this stage ran",
+    "process_peak_rss_mb": "process-wide high-water mark when the stage ended",
+    "process_peak_rss_growth_mb": "process-wide: rise in the high-water mark while the stage ran"
+}
+
+def count_data_rows(path):
+    """Number of rows in a TSV file with a header line, or None if it does not exist"""
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return max(0, sum(1 for _ in f) - 1)
+
+class StageMetrics:
+    """
+    Records wall time, CPU time and peak memory for one pipeline stage.
+
+    Use as a context manager around the stage. Only wall time and the CPU
+    time of the stage's own thread are attributed to the stage; child
+    process CPU time and peak RSS are process-wide (see METRIC_SCOPES), so
+    while stages run concurrently they include the other stages' work.
+    write_metrics lists the overlapping stages under concurrent_stages.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.status = "running"
+        self.items = {}
+
+    def __enter__(self):
+        self.started = time.time()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        self._children_start = children_cpu_seconds()
+        self._rss_start = peak_rss_mb()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.ended = time.time()
+        self.wall_seconds = time.perf_counter() - self._wall_start
+        self.cpu_seconds = time.thread_time() - self._cpu_start
+        self.child_cpu_seconds = children_cpu_seconds() - self._children_start
+        self.peak_rss_mb = peak_rss_mb()
+        self.status = "failed" if exc_type else "success"
+        return False
+
+    def overlaps(self, other):
+        return other is not self and self.started < other.ended and other.started < self.ended
+
+    def as_dict(self, concurrent_stages=()):
+        return {
+            "stage": self.name,
+            "status": self.status,
+            "started": self.started,
+            "wall_seconds": round(self.wall_seconds, 3),
+            "thread_cpu_seconds": round(self.cpu_seconds, 3),
+            "process_child_cpu_seconds": round(self.child_cpu_seconds, 3),
+            "process_peak_rss_mb": self.peak_rss_mb,
+            "process_peak_rss_growth_mb": (round(self.peak_rss_mb - self._rss_start, 1)
+                                           if self.peak_rss_mb is not None else None),
+            "concurrent_stages": list(concurrent_stages),
+            "items": self.items
+        }
+
+def write_metrics(stage_metrics, output_path, book_id=None, total_wall_seconds=None):
+    """Write the collected stage metrics as pipeline_metrics.json"""
+    report = {
+        "book_id": book_id,
+        "generated": time.time(),
+        "total_wall_seconds": round(total_wall_seconds, 3) if total_wall_seconds else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "metric_scopes": METRIC_SCOPES,
+        "stages": [metrics.as_dict([other.name for other in stage_metrics if metrics.overlaps(other)])
+                   for metrics in stage_metrics]
+    }
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Pipeline metrics saved to {output_path}")
+    return output_path
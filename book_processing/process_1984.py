@@ -1,25 +1,23 @@
 import os
 import json
-from booknlp.booknlp import BookNLP
+from collections import defaultdict, Counter
+from process_text_with_booknlp import load_booknlp
+from booknlp_tables import load_entities, load_quotes
+from character_merge import consolidate_clusters
+from mentions import MentionList, characters_to_json, json_indent, DEFAULT_MENTION_FORMAT
 
 def process_book_with_booknlp(input_file, output_dir, book_id):
     """Process the book with BookNLP"""
-    # Configure model parameters
-    model_params = {
-        "pipeline": "entity,quote,supersense,event,coref",
-        "model": "small"  # Using small model for better compatibility
-    }
-    
-    # Initialize the BookNLP instance
-    booknlp = BookNLP("en", model_params)
+    # Reuse the BookNLP instance if one is already loaded in this process
+    booknlp = load_booknlp()
     
     # Process the book
     print(f"Processing {input_file} with BookNLP...")
     booknlp.process(input_file, output_dir, book_id)
     print(f"Processing complete. Results saved to {output_dir}")
 
-def convert_to_structured_json(output_dir, book_id):
-    """Convert BookNLP output to structured JSON files"""
+def convert_to_structured_json(output_dir, book_id, mention_format=DEFAULT_MENTION_FORMAT):
+    """Convert BookNLP output to structured JSON files (mention_format: see mentions.MENTION_FORMATS)"""
     output_files = {
         "characters": {},
         "quotes": {},
@@ -34,54 +32,69 @@ def convert_to_structured_json(output_dir, book_id):
     
     # Process character data
     character_data = {}
+    representatives = {}
     if os.path.exists(entities_file):
         print(f"Processing character data from {entities_file}")
-        with open(entities_file, "r", encoding="utf-8") as f:
-            for line in f:
-                parts = line.strip().split("\t")
-                if len(parts) >= 6:
-                    coref_id, start_token, end_token, entity_type, entity_category, text = parts[:6]
-                    
-                    # Only process person entities
-                    if entity_category == "PER":
-                        if coref_id not in character_data:
-                            character_data[coref_id] = {
-                                "id": coref_id,
-                                "name": text,
-                                "mentions": [],
-                                "referential_gender": None,  # To be determined
-                                "quotes": [],
-                                "actions": []
-                            }
-                        
-                        character_data[coref_id]["mentions"].append({
-                            "text": text,
-                            "type": entity_type,  # PROP, NOM, PRON
-                            "start_token": start_token,
-                            "end_token": end_token
-                        })
+        entities = load_entities(entities_file)
+        prop_vocab = entities.vocab["prop"]
+        person = entities.vocab["cat"].code("PER")
+        for coref, start_token, end_token, entity_type, entity_category, text in zip(
+                entities["COREF"], entities["start_token"], entities["end_token"],
+                entities["prop"], entities["cat"], entities["text"]):
+            # Only process person entities
+            if entity_category != person:
+                continue
+            
+            coref_id = str(coref)
+            if coref_id not in character_data:
+                character_data[coref_id] = {
+                    "id": coref_id,
+                    "name": text,
+                    "mentions": MentionList(),
+                    "referential_gender": None,  # To be determined
+                    "quotes": [],
+                    "actions": []
+                }
+            
+            character_data[coref_id]["mentions"].append(
+                start_token, end_token, prop_vocab.decode(entity_type), text)  # PROP, NOM, PRON
+        
+        # Merge coref clusters that share a proper-name alias (see character_merge.py)
+        proper_aliases = defaultdict(Counter)
+        for coref_id, character in character_data.items():
+            for mention in character["mentions"]:
+                if mention["type"] == "PROP":
+                    proper_aliases[coref_id][mention["text"]] += 1
+        representatives = consolidate_clusters(
+            proper_aliases, {coref_id: len(c["mentions"]) for coref_id, c in character_data.items()})
+        for coref_id, character in character_data.items():
+            character["coref_ids"] = [coref_id]
+        for coref_id, representative_id in representatives.items():
+            if coref_id != representative_id:
+                merged = character_data.pop(coref_id)
+                character_data[representative_id]["mentions"].extend(merged["mentions"])
+                character_data[representative_id]["coref_ids"].append(coref_id)
     
     # Process quotes
     if os.path.exists(quotes_file):
         print(f"Processing quotes from {quotes_file}")
-        with open(quotes_file, "r", encoding="utf-8") as f:
-            for line in f:
-                parts = line.strip().split("\t")
-                if len(parts) >= 7:
-                    quote_start, quote_end, speaker_start, speaker_end, speaker_text, speaker_id, quote_text = parts[:7]
-                    
-                    # Store the quote with its speaker
-                    if speaker_id in character_data:
-                        character_data[speaker_id]["quotes"].append({
-                            "text": quote_text,
-                            "start_token": quote_start,
-                            "end_token": quote_end
-                        })
+        quotes = load_quotes(quotes_file)
+        for quote_start, quote_end, speaker_id, quote_text in zip(
+                quotes["quote_start"], quotes["quote_end"], quotes["char_id"], quotes["quote"]):
+            # Store the quote with its speaker
+            speaker_id = representatives.get(str(speaker_id))
+            if speaker_id in character_data:
+                character_data[speaker_id]["quotes"].append({
+                    "text": quote_text,
+                    "start_token": str(quote_start),
+                    "end_token": str(quote_end)
+                })
     
     # Save the character data
     characters_json_path = os.path.join(output_dir, "characters.json")
     with open(characters_json_path, "w", encoding="utf-8") as f:
-        json.dump(list(character_data.values()), f, indent=2)
+        json.dump(characters_to_json(character_data.values(), mention_format), f,
+                  indent=json_indent(mention_format))
     
     print(f"Character data saved to {characters_json_path}")
     
@@ -1,8 +1,46 @@
 import os
 import json
-import re
-from collections import defaultdict
-from booknlp.booknlp import BookNLP
+import argparse
+import threading
+from collections import defaultdict, Counter
+
+from stage_cache import run_cached
+from booknlp_tables import load_entities, load_quotes
+from booknlp_book import load_character_summaries
+from token_index import TokenIndex
+from supersense_join import extract_supersense_profiles, top_supersenses
+from character_merge import consolidate_clusters
+from mentions import MentionList, characters_to_json, json_indent, MENTION_FORMATS, DEFAULT_MENTION_FORMAT
+from token_scan import scan_tokens, ThemeKeywordCounter, MentionCollector
+from cooccurrence import cooccurrence
+
+# BookNLP configuration; part of the cache key for the BookNLP stage
+MODEL_PARAMS = {
+    "pipeline": "entity,quote,supersense,event,coref",
+    "model": "small"  # Using small model for better compatibility
+}
+
+# Files BookNLP writes for each book
+BOOKNLP_OUTPUT_EXTENSIONS = ["entities", "tokens", "quotes", "supersense", "book"]
+
+# The loaded BookNLP model, shared by every book processed in this process
+_booknlp = None
+_booknlp_lock = threading.Lock()
+
+def load_booknlp():
+    """
+    Return the BookNLP model, loading it on first use.
+
+    Loading the model (and importing torch) is slow, so it is done once per
+    process and reused for every later book.
+    """
+    global _booknlp
+    with _booknlp_lock:
+        if _booknlp is None:
+            # Imported here so the extraction functions can be used without loading torch
+            from booknlp.booknlp import BookNLP
+            _booknlp = BookNLP("en", MODEL_PARAMS)
+        return _booknlp
 
 def process_book_with_booknlp(input_file, output_dir, book_id):
     """
@@ -16,12 +54,7 @@ def process_book_with_booknlp(input_file, output_dir, book_id):
     print(f"Processing {input_file} with BookNLP...")
     
     # Initialize BookNLP with correct configuration
-    model_params = {
-        "pipeline": "entity,quote,supersense,event,coref",
-        "model": "small"  # Using small model for better compatibility
-    }
-    
-    booknlp = BookNLP("en", model_params)
+    booknlp = load_booknlp()
     
     # Process the book
     booknlp.process(input_file, output_dir, book_id)
@@ -33,6 +66,10 @@ def extract_characters(entities_file, tokens_file, quotes_file):
     """
     Extract character information from BookNLP output files.
     
+    Coref clusters that share a proper-name alias are merged into one
+    character (see character_merge.py), identified by its largest cluster;
+    the merged cluster IDs are listed in coref_ids.
+    
     Args:
         entities_file (str): Path to the entities.csv file
         tokens_file (str): Path to the tokens.csv file
@@ -44,61 +81,70 @@ def extract_characters(entities_file, tokens_file, quotes_file):
     print("Extracting character information...")
     
     # Load entity data
+    entities = load_entities(entities_file)
+    coref_ids = entities["COREF"]
+    start_tokens = entities["start_token"]
+    end_tokens = entities["end_token"]
+    entity_types = entities["prop"]
+    entity_categories = entities["cat"]
+    texts = entities["text"]
+    prop_vocab = entities.vocab["prop"]
+    person = entities.vocab["cat"].code("PER")
+    proper = prop_vocab.code("PROP")
+    
     entity_data = {}
-    with open(entities_file, 'r', encoding='utf-8') as f:
-        next(f)  # Skip header
-        for line in f:
-            parts = line.strip().split('\t')
-            if len(parts) >= 6:
-                entity_id = parts[0]
-                start_token = parts[1]
-                end_token = parts[2]
-                entity_type = parts[3]
-                entity_category = parts[4]
-                text = parts[5]
-                
-                # Only process PER (person) entities
-                if entity_category == "PER":
-                    if entity_id not in entity_data:
-                        entity_data[entity_id] = {
-                            "id": entity_id,
-                            "name": text,
-                            "mention_count": 0,
-                            "gender": "unknown",
-                            "aliases": set([text]),
-                            "mentions": [],
-                            "quote_count": 0,
-                            "sample_quotes": []
-                        }
-                    
-                    entity_data[entity_id]["mention_count"] += 1
-                    if entity_type == "PROP" and text not in entity_data[entity_id]["aliases"]:
-                        entity_data[entity_id]["aliases"].add(text)
-                    
-                    # Add mention
-                    mention = {
-                        "text": text,
-                        "type": entity_type,
-                        "start_token": start_token,
-                        "end_token": end_token
-                    }
-                    entity_data[entity_id]["mentions"].append(mention)
+    proper_aliases = defaultdict(Counter)
+    for row in range(len(entities)):
+        # Only process PER (person) entities
+        if entity_categories[row] != person:
+            continue
+        
+        entity_id = str(coref_ids[row])
+        text = texts[row]
+        if entity_id not in entity_data:
+            entity_data[entity_id] = {
+                "id": entity_id,
+                "name": text,
+                "mention_count": 0,
+                "gender": "unknown",
+                "aliases": set([text]),
+                "mentions": MentionList(),
+                "quote_count": 0,
+                "sample_quotes": []
+            }
+        
+        entity_data[entity_id]["mention_count"] += 1
+        if entity_types[row] == proper:
+            entity_data[entity_id]["aliases"].add(text)
+            proper_aliases[entity_id][text] += 1
+        
+        # Add mention
+        entity_data[entity_id]["mentions"].append(start_tokens[row], end_tokens[row],
+                                                  prop_vocab.decode(entity_types[row]), text)
+    
+    # Merge clusters that are the same person into their representative
+    representatives = consolidate_clusters(
+        proper_aliases, {entity_id: data["mention_count"] for entity_id, data in entity_data.items()})
+    for entity_id, data in entity_data.items():
+        data["coref_ids"] = [entity_id]
+    for entity_id, representative_id in representatives.items():
+        if entity_id == representative_id:
+            continue
+        merged = entity_data.pop(entity_id)
+        target = entity_data[representative_id]
+        target["mention_count"] += merged["mention_count"]
+        target["aliases"] |= merged["aliases"]
+        target["mentions"].extend(merged["mentions"])
+        target["coref_ids"].append(entity_id)
     
     # Load quotes data
+    quotes = load_quotes(quotes_file)
     character_quotes = defaultdict(list)
-    with open(quotes_file, 'r', encoding='utf-8') as f:
-        next(f)  # Skip header
-        for line in f:
-            parts = line.strip().split('\t')
-            if len(parts) >= 7:
-                quote_start = parts[0]
-                quote_end = parts[1]
-                speaker_id = parts[5]
-                quote_text = parts[6]
-                
-                if speaker_id in entity_data:
-                    entity_data[speaker_id]["quote_count"] += 1
-                    character_quotes[speaker_id].append(quote_text)
+    for speaker, quote_text in zip(quotes["char_id"], quotes["quote"]):
+        speaker_id = representatives.get(str(speaker))
+        if speaker_id in entity_data:
+            entity_data[speaker_id]["quote_count"] += 1
+            character_quotes[speaker_id].append(quote_text)
     
     # Add sample quotes (up to 10 per character)
     for entity_id, quotes in character_quotes.items():
@@ -122,6 +168,26 @@ def extract_characters(entities_file, tokens_file, quotes_file):
     print(f"Extracted information for {len(top_characters)} main characters")
     return top_characters
 
+# Text unit two characters must share to count as co-occurring (see cooccurrence.UNITS)
+RELATIONSHIP_UNIT = "paragraph"
+RELATIONSHIP_WINDOW_TOKENS = 50
+
+# Potential themes and their keywords for 1984
+THEME_KEYWORDS = {
+    "Totalitarianism": ["big brother", "party", "government", "control", "watching", 
+                      "surveillance", "power", "authority", "police", "ministry"],
+    "Surveillance": ["telescreen", "watching", "spying", "observe", "listen", "monitor", 
+                   "camera", "eye", "watched", "privacy"],
+    "Psychological Manipulation": ["doublethink", "newspeak", "thoughtcrime", "memory", 
+                                 "alter", "propaganda", "brainwash", "mind", "thought", "language"],
+    "Rebellion": ["resist", "rebel", "freedom", "fight", "against", "defy", 
+                 "disobey", "rebel", "resistance", "revolution"],
+    "Loss of Identity": ["identity", "self", "individual", "personality", "conform", 
+                       "vaporize", "person", "human", "dignity", "self-expression"],
+    "Historical Revisionism": ["history", "memory", "change", "rewrite", "record", 
+                            "ministry of truth", "past", "document", "adjust", "memory hole"]
+}
+
 def extract_themes(tokens_file, character_data):
     """
     Extract theme information from BookNLP output.
@@ -138,50 +204,16 @@ def extract_themes(tokens_file, character_data):
     """
     print("Extracting theme information...")
     
-    # Define potential themes and their keywords for 1984
-    theme_keywords = {
-        "Totalitarianism": ["big brother", "party", "government", "control", "watching", 
-                          "surveillance", "power", "authority", "police", "ministry"],
-        "Surveillance": ["telescreen", "watching", "spying", "observe", "listen", "monitor", 
-                       "camera", "eye", "watched", "privacy"],
-        "Psychological Manipulation": ["doublethink", "newspeak", "thoughtcrime", "memory", 
-                                     "alter", "propaganda", "brainwash", "mind", "thought", "language"],
-        "Rebellion": ["resist", "rebel", "freedom", "fight", "against", "defy", 
-                     "disobey", "rebel", "resistance", "revolution"],
-        "Loss of Identity": ["identity", "self", "individual", "personality", "conform", 
-                           "vaporize", "person", "human", "dignity", "self-expression"],
-        "Historical Revisionism": ["history", "memory", "change", "rewrite", "record", 
-                                "ministry of truth", "past", "document", "adjust", "memory hole"]
-    }
-    
-    # Count keyword occurrences
-    theme_counts = {theme: 0 for theme in theme_keywords}
-    theme_evidence = {theme: [] for theme in theme_keywords}
-    
-    # Load token data and count theme keywords
-    text = ""
-    with open(tokens_file, 'r', encoding='utf-8') as f:
-        next(f)  # Skip header
-        for line in f:
-            parts = line.strip().split('\t')
-            if len(parts) >= 4:
-                token = parts[3].lower()
-                sentence_id = parts[1]
-                text += token + " "
-                
-                # Check if token is part of any theme keywords
-                for theme, keywords in theme_keywords.items():
-                    for keyword in keywords:
-                        if keyword == token or (len(keyword.split()) > 1 and keyword in text[-100:]):
-                            theme_counts[theme] += 1
-                            if sentence_id not in theme_evidence[theme]:
-                                theme_evidence[theme].append(sentence_id)
-    
-    # Create theme data
+    counter = ThemeKeywordCounter(THEME_KEYWORDS)
+    scan_tokens(tokens_file, [counter])
+    return build_themes(counter)
+
+def build_themes(counter):
+    """Turn the results of a ThemeKeywordCounter into theme dictionaries"""
     themes = []
-    for theme, keywords in theme_keywords.items():
-        occurrence_count = theme_counts[theme]
-        evidence_sentence_ids = theme_evidence[theme][:10]  # Limit to 10 examples
+    for theme, keywords in counter.theme_keywords.items():
+        occurrence_count = counter.counts[theme]
+        evidence_sentence_ids = counter.evidence[theme][:10]  # Limit to 10 examples
         
         themes.append({
             "name": theme,
@@ -196,7 +228,20 @@ def extract_themes(tokens_file, character_data):
     print(f"Extracted information for {len(themes)} themes")
     return themes
 
-def extract_relationships(entities_file, quotes_file, tokens_file, character_data):
+def character_mention_starts(entities_file, character_data):
+    """Map each start token (as a string) to the characters whose mentions begin there"""
+    # A character may stand for several merged coref clusters
+    character_ids = {coref_id: c["id"] for c in character_data for coref_id in c.get("coref_ids", [c["id"]])}
+    entities = load_entities(entities_file)
+    mention_starts = defaultdict(set)
+    for coref_id, start_token in zip(entities["COREF"], entities["start_token"]):
+        entity_id = character_ids.get(str(coref_id))
+        if entity_id is not None:
+            mention_starts[str(start_token)].add(entity_id)
+    return mention_starts
+
+def extract_relationships(entities_file, quotes_file, tokens_file, character_data,
+                          unit=RELATIONSHIP_UNIT, window_tokens=RELATIONSHIP_WINDOW_TOKENS):
     """
     Extract relationship information between characters.
     
@@ -205,50 +250,24 @@ def extract_relationships(entities_file, quotes_file, tokens_file, character_dat
         quotes_file (str): Path to the quotes.csv file
         tokens_file (str): Path to the tokens.csv file
         character_data (list): List of character dictionaries
+        unit (str): Sentence, paragraph, chapter or a sliding window
+        window_tokens (int): Window size in tokens when unit is "window"
     
     Returns:
         list: List of relationship dictionaries
     """
     print("Extracting relationship information...")
     
+    # Count co-occurrences in the same unit of text
+    collector = MentionCollector(character_mention_starts(entities_file, character_data))
+    scan_tokens(tokens_file, [collector])
+    counts, weights = cooccurrence(collector.mentions, unit, window_tokens)
+    return build_relationships(counts, character_data, weights)
+
+def build_relationships(co_occurrences, character_data, weighted_strengths=None):
+    """Turn pair co-occurrence counts (and distance-weighted strengths) into relationship dictionaries"""
     # Create a map of character IDs to data
     character_map = {c["id"]: c for c in character_data}
-    character_ids = set(character_map.keys())
-    
-    # Count co-occurrences in the same paragraphs
-    co_occurrences = defaultdict(int)
-    
-    # Track the current paragraph
-    current_para = ""
-    para_entities = set()
-    
-    # Process tokens to find co-occurrences in paragraphs
-    with open(tokens_file, 'r', encoding='utf-8') as f:
-        next(f)  # Skip header
-        current_para_id = None
-        
-        for line in f:
-            parts = line.strip().split('\t')
-            if len(parts) >= 8:
-                para_id = parts[2]
-                entity_id = parts[7]
-                
-                # If we've moved to a new paragraph
-                if para_id != current_para_id:
-                    # Process the previous paragraph's entities
-                    entities_list = list(para_entities & character_ids)
-                    for i in range(len(entities_list)):
-                        for j in range(i+1, len(entities_list)):
-                            pair = tuple(sorted([entities_list[i], entities_list[j]]))
-                            co_occurrences[pair] += 1
-                    
-                    # Reset for new paragraph
-                    current_para_id = para_id
-                    para_entities = set()
-                
-                # Add entity to current paragraph if it's a character
-                if entity_id in character_ids:
-                    para_entities.add(entity_id)
     
     # Define some relationship types based on character interactions
     # In a full implementation, you would use more sophisticated NLP to determine relationship types
@@ -275,6 +294,8 @@ def extract_relationships(entities_file, quotes_file, tokens_file, character_dat
                 "type": relationship_type,
                 "strength": strength
             })
+            if weighted_strengths is not None:
+                relationships[-1]["weighted_strength"] = round(weighted_strengths[(char1_id, char2_id)], 3)
     
     # Sort by strength
     relationships.sort(key=lambda x: x["strength"], reverse=True)
@@ -282,13 +303,38 @@ def extract_relationships(entities_file, quotes_file, tokens_file, character_dat
     print(f"Extracted {len(relationships)} character relationships")
     return relationships
 
-def create_character_profiles(character_data, relationship_data):
+def extract_themes_and_relationships(entities_file, tokens_file, character_data,
+                                     unit=RELATIONSHIP_UNIT, window_tokens=RELATIONSHIP_WINDOW_TOKENS):
+    """
+    Extract themes and relationships in a single pass over the tokens file.
+
+    Equivalent to calling extract_themes and extract_relationships, but the
+    tokens file is read and parsed only once.
+
+    Returns:
+        tuple: (list of theme dictionaries, list of relationship dictionaries)
+    """
+    print("Extracting theme and relationship information...")
+    
+    counter = ThemeKeywordCounter(THEME_KEYWORDS)
+    collector = MentionCollector(character_mention_starts(entities_file, character_data))
+    scan_tokens(tokens_file, [counter, collector])
+    counts, weights = cooccurrence(collector.mentions, unit, window_tokens)
+    return build_themes(counter), build_relationships(counts, character_data, weights)
+
+def create_character_profiles(character_data, relationship_data, character_summaries=None,
+                              token_index=None, supersense_data=None):
     """
     Create more detailed character profiles by combining character and relationship data.
     
     Args:
         character_data (list): List of character dictionaries
         relationship_data (list): List of relationship dictionaries
+        character_summaries (dict): Optional character ID to the actions and
+            attributes read from the BookNLP .book file (see booknlp_book.py)
+        token_index (TokenIndex): Optional index used to quote the sentences
+            where the character is first named
+        supersense_data (dict): Optional extract_supersense_profiles output
     
     Returns:
         list: List of character profile dictionaries
@@ -303,6 +349,7 @@ def create_character_profiles(character_data, relationship_data):
     
     # Infer character traits based on quote content and relationships
     character_profiles = []
+    unresolved_mentions = 0
     
     for character in character_data:
         char_id = character["id"]
@@ -321,6 +368,22 @@ def create_character_profiles(character_data, relationship_data):
             "description": f"{character['name']} is a character in George Orwell's \"1984\"."
         }
         
+        # Add what the character does and is described as, if BookNLP's .book file was read
+        summary = (character_summaries or {}).get(char_id)
+        if summary:
+            profile["actions"] = summary["actions"]
+            profile["acted_on"] = summary["acted_on"]
+            profile["attributes"] = summary["attributes"]
+            profile["possessions"] = summary["possessions"]
+            profile["pronouns"] = summary["pronouns"]
+        
+        if token_index is not None:
+            profile["mention_snippets"], unresolved = mention_snippets(character, token_index)
+            unresolved_mentions += unresolved
+        
+        if supersense_data is not None:
+            profile["supersenses"] = top_supersenses(supersense_data, char_id)
+        
         # Infer character role based on mention count
         if character["mention_count"] == max(c["mention_count"] for c in character_data):
             profile["role"] = "protagonist"
@@ -355,25 +418,73 @@ def create_character_profiles(character_data, relationship_data):
         
         character_profiles.append(profile)
     
+    if unresolved_mentions:
+        print(f"Warning: skipped {unresolved_mentions} mentions whose tokens are not in the tokens table")
     print(f"Created detailed profiles for {len(character_profiles)} characters")
     return character_profiles
 
-def save_data_to_json(data, filename):
+def mention_snippets(character, token_index, limit=3):
+    """
+    Sentences containing the character's first few proper-name mentions.
+
+    Mentions whose tokens are missing from the tokens table (e.g. from a
+    mismatched BookNLP run) are skipped.
+
+    Returns:
+        tuple: (list of snippets, number of mentions skipped)
+    """
+    snippets = []
+    unresolved = 0
+    for mention in character["mentions"]:
+        if mention["type"] != "PROP":
+            continue
+        try:
+            snippet = token_index.span_text(int(mention["start_token"]), int(mention["end_token"]),
+                                            context_sentences=0)
+        except (KeyError, IndexError):
+            unresolved += 1
+            continue
+        if snippet not in snippets:
+            snippets.append(snippet)
+        if len(snippets) == limit:
+            break
+    return snippets, unresolved
+
+def attach_evidence_snippets(theme_data, token_index, limit=3):
+    """Add the text of each theme's first few evidence sentences as evidence_snippets"""
+    for theme in theme_data:
+        theme["evidence_snippets"] = [token_index.sentence_text(int(sentence_id))
+                                      for sentence_id in theme["evidence_sentence_ids"][:limit]]
+    return theme_data
+
+def save_data_to_json(data, filename, output_dir="book_processing/output", indent=2):
     """Save data to a JSON file"""
-    output_path = os.path.join("book_processing/output", filename)
+    output_path = os.path.join(output_dir, filename)
     with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+        json.dump(data, f, indent=indent)
     print(f"Saved data to {output_path}")
     return output_path
 
+def save_characters(character_data, output_dir="book_processing/output",
+                    mention_format=DEFAULT_MENTION_FORMAT):
+    """Save characters.json with mentions in the given format (see mentions.MENTION_FORMATS)"""
+    return save_data_to_json(characters_to_json(character_data, mention_format), "characters.json",
+                             output_dir, indent=json_indent(mention_format))
+
 def ensure_directories():
     """Ensure all necessary directories exist"""
     os.makedirs("book_processing/data", exist_ok=True)
     os.makedirs("book_processing/output", exist_ok=True)
     print("Created directories for BookNLP processing")
 
-def process_1984():
-    """Main function to process 1984 with BookNLP"""
+def process_1984(force=False, mention_format=DEFAULT_MENTION_FORMAT):
+    """
+    Main function to process 1984 with BookNLP
+
+    Args:
+        force (bool): Rerun BookNLP even if the text and model settings are unchanged
+        mention_format (str): How mentions are written to characters.json
+    """
     ensure_directories()
     
     # Input and output paths
@@ -387,8 +498,15 @@ def process_1984():
         print("Please run extract_pdf_text.py first to convert the PDF to text.")
         return
     
-    # Process the book with BookNLP
-    process_book_with_booknlp(input_file, output_dir, book_id)
+    # Process the book with BookNLP, unless the text and model settings are unchanged
+    booknlp_outputs = [os.path.join(output_dir, f"{book_id}.{ext}")
+                       for ext in BOOKNLP_OUTPUT_EXTENSIONS]
+    run_cached("booknlp",
+               [input_file],
+               {"book_id": book_id, "model_params": MODEL_PARAMS},
+               booknlp_outputs,
+               lambda: process_book_with_booknlp(input_file, output_dir, book_id),
+               force=force)
     
     # Paths to the BookNLP output files
     entities_file = os.path.join(output_dir, f"{book_id}.entities")
@@ -397,21 +515,39 @@ def process_1984():
     
     # Extract character information
     character_data = extract_characters(entities_file, tokens_file, quotes_file)
-    save_data_to_json(character_data, "characters.json")
+    save_characters(character_data, mention_format=mention_format)
     
-    # Extract theme information
-    theme_data = extract_themes(tokens_file, character_data)
-    save_data_to_json(theme_data, "themes.json")
+    # Extract theme and relationship information in one pass over the tokens
+    theme_data, relationship_data = extract_themes_and_relationships(
+        entities_file, tokens_file, character_data)
     
-    # Extract relationship information
-    relationship_data = extract_relationships(entities_file, quotes_file, tokens_file, character_data)
+    # Quote the evidence for themes and characters from the text itself
+    token_index = TokenIndex.from_booknlp(tokens_file, input_file)
+    attach_evidence_snippets(theme_data, token_index)
+    save_data_to_json(theme_data, "themes.json")
     save_data_to_json(relationship_data, "relationships.json")
     
     # Create character profiles
-    character_profile_data = create_character_profiles(character_data, relationship_data)
+    book_file = os.path.join(output_dir, f"{book_id}.book")
+    character_summaries = (load_character_summaries(book_file, [c["id"] for c in character_data])
+                           if os.path.exists(book_file) else None)
+    supersense_file = os.path.join(output_dir, f"{book_id}.supersense")
+    supersense_data = None
+    if os.path.exists(supersense_file):
+        supersense_data = extract_supersense_profiles(supersense_file, tokens_file, character_data)
+        save_data_to_json(supersense_data, "supersense.json", indent=None)
+    character_profile_data = create_character_profiles(character_data, relationship_data,
+                                                       character_summaries, token_index,
+                                                       supersense_data)
     save_data_to_json(character_profile_data, "character_profiles.json")
     
     print("BookNLP processing of 1984 complete!")
 
 if __name__ == "__main__":
-    process_1984()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run BookNLP on 1984 and save character and theme data")
+    parser.add_argument("--force", action="store_true",
+                        help="Rerun BookNLP even if the text and model settings are unchanged")
+    parser.add_argument("--mentions", choices=MENTION_FORMATS, default=DEFAULT_MENTION_FORMAT,
+                        help="How mentions are written to characters.json")
+    args = parser.parse_args()
+    process_1984(force=args.force, mention_format=args.mentions)
\ No newline at end of file
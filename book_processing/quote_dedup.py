@@ -0,0 +1,108 @@
+import re
+import zlib
+from collections import defaultdict
+
+# Jaccard similarity of word shingles above which two quotes are the same passage
+NEAR_DUPLICATE_THRESHOLD = 0.8
+
+SHINGLE_WORDS = 3
+MINHASH_BANDS = 10
+MINHASH_ROWS = 3
+
+# Fixed (a, b) pairs for the MinHash permutations h(x) = (a * x + b) mod p,
+# so signatures are the same in every process and run
+_PRIME = (1 << 31) - 1
+_PERMUTATIONS = [(1 + (i * 2654435761) % (_PRIME - 1), (i * 40503 + 12345) % _PRIME)
+                 for i in range(MINHASH_BANDS * MINHASH_ROWS)]
+
+# PDF line wrapping splits words as "Win - ston" or "Win- ston"
+HYPHEN_BREAK = re.compile(r"(\w)\s*-\s+(\w)")
+NON_WORD = re.compile(r"[^\w\s]")
+
+def normalize_quote(text):
+    """Lowercase, rejoin words broken across lines, drop punctuation and collapse whitespace"""
+    text = HYPHEN_BREAK.sub(r"\1\2", text.lower())
+    return " ".join(NON_WORD.sub(" ", text).split())
+
+def shingles(normalized):
+    """Hashes of the overlapping SHINGLE_WORDS-word sequences of a normalized quote"""
+    words = normalized.split()
+    if len(words) <= SHINGLE_WORDS:
+        return {zlib.crc32(normalized.encode("utf-8"))}
+    return {zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8"))
+            for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+def minhash_bands(shingle_hashes):
+    """The MinHash signature of a shingle set, split into LSH band keys"""
+    signature = [min([(a * x + b) % _PRIME for x in shingle_hashes]) for a, b in _PERMUTATIONS]
+    return [(band, tuple(signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS]))
+            for band in range(MINHASH_BANDS)]
+
+def fingerprint(text):
+    """
+    The normalized text, shingle set and LSH band keys of a quote.
+
+    Computing these is most of the cost of a near-duplicate check, and
+    they do not depend on earlier quotes, so they can be computed ahead of
+    time (for example in worker processes) and passed to
+    QuoteDeduplicator.add.
+    """
+    normalized = normalize_quote(text)
+    quote_shingles = shingles(normalized)
+    return normalized, quote_shingles, minhash_bands(quote_shingles)
+
+class QuoteDeduplicator:
+    """
+    Decides whether a quote repeats one already kept.
+
+    Exact repeats are found in a hash set. With a threshold set, so are
+    repeats that differ only in whitespace, punctuation or line-break
+    hyphenation, and passages whose word shingles overlap by at least the
+    threshold (Jaccard similarity). Near-duplicate candidates come from
+    MinHash locality-sensitive hashing and are confirmed on the real
+    shingle sets, so each check costs about the same however many quotes
+    have been kept.
+
+    Args:
+        threshold (float): Near-duplicate similarity, or None for exact text only
+    """
+
+    def __init__(self, threshold=NEAR_DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self.texts = set()
+        self.normalized = set()
+        self.buckets = defaultdict(list)
+        self.kept_shingles = []
+
+    def add(self, text, quote_fingerprint=None):
+        """
+        Record a quote; returns False (and records nothing) if it is a duplicate.
+
+        Args:
+            quote_fingerprint (tuple): fingerprint(text), if already computed
+        """
+        if text in self.texts:
+            return False
+        if self.threshold is None:
+            self.texts.add(text)
+            return True
+
+        if quote_fingerprint is None:
+            quote_fingerprint = fingerprint(text)
+        normalized, quote_shingles, band_keys = quote_fingerprint
+        if normalized in self.normalized:
+            return False
+        for key in band_keys:
+            for index in self.buckets.get(key, ()):
+                kept = self.kept_shingles[index]
+                overlap = len(quote_shingles & kept)
+                if overlap / (len(quote_shingles) + len(kept) - overlap) >= self.threshold:
+                    return False
+
+        self.texts.add(text)
+        self.normalized.add(normalized)
+        index = len(self.kept_shingles)
+        self.kept_shingles.append(quote_shingles)
+        for key in band_keys:
+            self.buckets[key].append(index)
+        return True
@@ -0,0 +1,225 @@
+import argparse
+import heapq
+import json
+import math
+import os
+from collections import Counter, defaultdict
+from itertools import accumulate
+
+from quote_dedup import normalize_quote
+from quote_stream import iter_ndjson
+from stage_cache import hash_inputs
+
+# BM25 term-frequency saturation and document-length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Share of a query's character trigrams a quote must contain to be a fuzzy match
+MIN_TRIGRAM_SIMILARITY = 0.5
+
+SEARCH_INDEX_VERSION = 2
+
+def tokenize(text):
+    """Lowercased words, with words broken across PDF lines rejoined"""
+    return normalize_quote(text).split()
+
+def trigrams(normalized):
+    """The character trigrams of normalized text, padded so word edges count"""
+    padded = f" {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def gap_encode(docs):
+    """Store an ascending document list as gaps from the previous document, which are shorter in JSON"""
+    return [doc - previous for previous, doc in zip([0] + docs, docs)]
+
+def quotes_source(quotes_path, quote_count):
+    """The quotes file an index was built from, as recorded in its source field"""
+    return {"file": os.path.basename(str(quotes_path)), "quoteCount": quote_count,
+            "sha256": hash_inputs([quotes_path])}
+
+def index_matches_quotes(search_index, quotes_path):
+    """Whether a search index was built from the current contents of quotes_path"""
+    source = search_index.get("source")
+    return (source is not None
+            and source == quotes_source(quotes_path, len(search_index["quote_ids"])))
+
+def build_search_index(quotes, quotes_path=None):
+    """
+    Build a full-text index over quotes.
+
+    Quotes are numbered by position ("documents"); the index maps each
+    word to its documents and term frequencies and each character trigram
+    of the normalized text to the documents containing it, and records
+    every document's length in words. Document lists are gap encoded and
+    only the quote IDs are kept, so the index stays small and results are
+    looked up in the quotes file.
+
+    Args:
+        quotes: Iterable of quote dictionaries, such as 1984_quotes.json
+            or the lines of 1984_quotes.ndjson
+        quotes_path (str): The file the quotes were read from; its name,
+            quote count and content hash are recorded as "source", so
+            index_matches_quotes can tell when the quotes were rewritten
+
+    Returns:
+        dict: The JSON-serializable index
+    """
+    quote_ids = []
+    doc_lengths = []
+    postings = defaultdict(list)
+    frequencies = defaultdict(list)
+    trigram_postings = defaultdict(list)
+    for doc, quote in enumerate(quotes):
+        normalized = normalize_quote(quote["text"])
+        words = normalized.split()
+        quote_ids.append(quote["id"])
+        doc_lengths.append(len(words))
+        for term, frequency in Counter(words).items():
+            postings[term].append(doc)
+            frequencies[term].append(frequency)
+        for gram in trigrams(normalized):
+            trigram_postings[gram].append(doc)
+
+    return {
+        "version": SEARCH_INDEX_VERSION,
+        "source": quotes_source(quotes_path, len(quote_ids)) if quotes_path else None,
+        "quote_ids": quote_ids,
+        "doc_lengths": doc_lengths,
+        "postings": {term: gap_encode(docs) for term, docs in postings.items()},
+        "frequencies": dict(frequencies),
+        "trigrams": {gram: gap_encode(docs) for gram, docs in trigram_postings.items()}
+    }
+
+def save_search_index(search_index, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(search_index, f, separators=(",", ":"))
+    print(f"Search index for {len(search_index['quote_ids'])} quotes "
+          f"({len(search_index['postings'])} terms) saved to {path}")
+
+def load_quotes(quotes_path):
+    """Read quotes from a .json or .ndjson quotes file"""
+    if str(quotes_path).endswith(".ndjson"):
+        return list(iter_ndjson(quotes_path))
+    with open(quotes_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+class QuoteSearchIndex:
+    """
+    Ranked and fuzzy queries over a build_search_index index.
+
+    search() scores only the quotes that contain a query word, reading one
+    posting list per word, so a query costs about the length of those
+    lists rather than the number of quotes.
+
+    Args:
+        search_index (dict): build_search_index output
+    """
+
+    def __init__(self, search_index, k1=BM25_K1, b=BM25_B):
+        if search_index.get("version") != SEARCH_INDEX_VERSION:
+            raise ValueError(f"Unsupported search index version {search_index.get('version')!r}")
+        self.quote_ids = search_index["quote_ids"]
+        frequencies = search_index["frequencies"]
+        # Term to (documents, term frequencies)
+        self.postings = {term: (list(accumulate(gaps)), frequencies[term])
+                         for term, gaps in search_index["postings"].items()}
+        self.trigrams = {gram: list(accumulate(gaps)) for gram, gaps in search_index["trigrams"].items()}
+        self.k1 = k1
+        doc_count = len(self.quote_ids)
+        average_length = sum(search_index["doc_lengths"]) / doc_count if doc_count else 0.0
+        # The length part of the BM25 denominator only depends on the document
+        self.length_norms = [k1 * (1 - b + b * length / average_length) if average_length else k1
+                             for length in search_index["doc_lengths"]]
+        self.doc_count = doc_count
+
+    @classmethod
+    def load(cls, path, quotes_path=None):
+        """
+        Read an index saved by save_search_index.
+
+        Raises:
+            ValueError: If quotes_path is given and the index was not built
+                from its current contents, so its quote IDs may be wrong
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            search_index = json.load(f)
+        if quotes_path is not None and not index_matches_quotes(search_index, quotes_path):
+            raise ValueError(f"{path} was not built from the current {quotes_path}")
+        return cls(search_index)
+
+    def idf(self, term):
+        """BM25 inverse document frequency, never negative"""
+        docs, _ = self.postings.get(term, ((), ()))
+        doc_frequency = len(docs)
+        return math.log(1 + (self.doc_count - doc_frequency + 0.5) / (doc_frequency + 0.5))
+
+    def search(self, query, top_k=10):
+        """
+        Rank quotes against a free-text query with BM25.
+
+        Returns:
+            list: Up to top_k (quote ID, score) pairs, best first
+        """
+        scores = defaultdict(float)
+        for term, query_frequency in Counter(tokenize(query)).items():
+            if term not in self.postings:
+                continue
+            docs, frequencies = self.postings[term]
+            weight = self.idf(term) * query_frequency * (self.k1 + 1)
+            length_norms = self.length_norms
+            for doc, frequency in zip(docs, frequencies):
+                scores[doc] += weight * frequency / (frequency + length_norms[doc])
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [(self.quote_ids[doc], score) for doc, score in best]
+
+    def fuzzy_search(self, query, top_k=10, min_similarity=MIN_TRIGRAM_SIMILARITY):
+        """
+        Find quotes containing most of a query's character trigrams.
+
+        Tolerates misspelled and partial words, so a half-remembered
+        fragment like "two plus two make fiv" still finds its quote. The
+        similarity is the share of the query's trigrams the quote contains.
+
+        Returns:
+            list: Up to top_k (quote ID, similarity) pairs, best first
+        """
+        query_grams = trigrams(normalize_quote(query))
+        if not query_grams:
+            return []
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self.trigrams.get(gram, ()))
+        threshold = min_similarity * len(query_grams)
+        best = heapq.nlargest(top_k, ((doc, count) for doc, count in shared.items() if count >= threshold),
+                              key=lambda item: item[1])
+        return [(self.quote_ids[doc], count / len(query_grams)) for doc, count in best]
+
+def load_or_build_search_index(index_path, quotes_path):
+    """Load the search index for quotes_path, rebuilding it if it is missing or stale"""
+    try:
+        return QuoteSearchIndex.load(index_path, quotes_path)
+    except FileNotFoundError:
+        print(f"No search index at {index_path}; building it")
+    except ValueError as e:
+        print(f"Rebuilding the search index: {e}")
+    search_index = build_search_index(load_quotes(quotes_path), quotes_path)
+    save_search_index(search_index, index_path)
+    return QuoteSearchIndex(search_index)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search the extracted quotes")
+    parser.add_argument("query", help="Words or a fragment of the quote")
+    parser.add_argument("--quotes", default="book_processing/output/1984_quotes.json",
+                        help="Quotes file (.json or .ndjson)")
+    parser.add_argument("--index", default="book_processing/output/1984_quote_search.json",
+                        help="Search index, rebuilt from the quotes file if missing or stale")
+    parser.add_argument("--fuzzy", action="store_true",
+                        help="Match character trigrams instead of ranking whole words")
+    parser.add_argument("--top-k", type=int, default=10, help="Number of results")
+    args = parser.parse_args()
+
+    index = load_or_build_search_index(args.index, args.quotes)
+    quotes = {quote["id"]: quote for quote in load_quotes(args.quotes)}
+    search = index.fuzzy_search if args.fuzzy else index.search
+    for quote_id, score in search(args.query, args.top_k):
+        print(f"{score:6.2f}  [{quote_id}] {quotes[quote_id]['text']}")
@@ -0,0 +1,84 @@
+import heapq
+import json
+import os
+import tempfile
+from itertools import islice
+
+# How extract_quotes writes its outputs:
+#   "json"   - one indented JSON document per file, built in memory
+#   "ndjson" - one JSON object per line, written as quotes are found
+QUOTE_FORMATS = ("json", "ndjson")
+DEFAULT_QUOTE_FORMAT = "json"
+
+# Records held in memory at once by external_sort_ndjson
+SORT_RUN_SIZE = 10000
+
+def ndjson_path(json_path, suffix=""):
+    """The line-delimited counterpart of a .json output path, e.g. 1984_quotes.ndjson"""
+    root, _ = os.path.splitext(str(json_path))
+    return f"{root}{suffix}.ndjson"
+
+def write_ndjson(records, path):
+    """
+    Write records as one JSON object per line.
+
+    The file is line buffered, so each record is on disk as soon as it is
+    written and other processes can read the file while it grows.
+
+    Returns:
+        int: The number of records written
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8", buffering=1) as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+            count += 1
+    return count
+
+def iter_ndjson(path):
+    """Lazily read the records of a JSON Lines file, skipping blank lines"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def external_sort_ndjson(source_path, output_path, key, run_size=SORT_RUN_SIZE):
+    """
+    Sort a JSON Lines file without loading it into memory.
+
+    The source is read in runs of run_size records; each run is sorted and
+    spilled to a temporary file, and the runs are then merged with
+    heapq.merge. Both steps are stable, so records with equal keys keep
+    their source order, as with list.sort. The output is written to a
+    temporary file and renamed into place, so readers never see a partly
+    sorted file.
+
+    Args:
+        key (callable): Sort key for a record
+
+    Returns:
+        int: The number of records sorted
+    """
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    run_paths = []
+    count = 0
+    try:
+        records = iter_ndjson(source_path)
+        while True:
+            run = list(islice(records, run_size))
+            if not run:
+                break
+            run.sort(key=key)
+            count += len(run)
+            fd, run_path = tempfile.mkstemp(suffix=".run.ndjson", dir=output_dir)
+            os.close(fd)
+            run_paths.append(run_path)
+            write_ndjson(run, run_path)
+
+        partial_path = output_path + ".partial"
+        write_ndjson(heapq.merge(*(iter_ndjson(path) for path in run_paths), key=key), partial_path)
+        os.replace(partial_path, output_path)
+    finally:
+        for run_path in run_paths:
+            os.remove(run_path)
+    return count
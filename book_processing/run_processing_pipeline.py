@@ -1,46 +1,438 @@
 import os
-import subprocess
 import sys
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
-def run_command(command, description):
-    """Run a command and display its output"""
-    print(f"\n===== {description} =====")
-    print(f"Running: {command}")
-    
-    try:
-        process = subprocess.run(command, shell=True, check=True, 
-                                text=True, capture_output=True)
-        print(process.stdout)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"Error running command: {e}")
-        print(f"Output: {e.stdout}")
-        print(f"Error: {e.stderr}")
-        return False
+from stage_cache import run_cached
+from pipeline_metrics import StageMetrics, count_data_rows, write_metrics
+from mentions import MENTION_FORMATS, DEFAULT_MENTION_FORMAT
+from quote_stream import QUOTE_FORMATS, DEFAULT_QUOTE_FORMAT, ndjson_path
+
+# Input and output paths for the default book
+PDF_PATH = "attached_assets/1984.pdf"
+DATA_DIR = "book_processing/data"
+OUTPUT_DIR = "book_processing/output"
+BOOK_ID = "1984"
+
+class Book:
+    """
+    Locations of one book's input PDF, intermediate data and JSON outputs.
+
+    Text and BookNLP files live in data_dir and are named after book_id, as
+    in data/1984.txt and data/1984_booknlp/1984.entities.
+    """
+
+    def __init__(self, book_id, pdf_path, data_dir, output_dir):
+        self.book_id = book_id
+        self.pdf_path = pdf_path
+        self.data_dir = data_dir
+        self.output_dir = output_dir
+
+    @property
+    def text_path(self):
+        return os.path.join(self.data_dir, f"{self.book_id}.txt")
+
+    @property
+    def booknlp_dir(self):
+        return os.path.join(self.data_dir, f"{self.book_id}_booknlp")
+
+    @property
+    def cache_manifest(self):
+        return os.path.join(self.data_dir, "stage_cache.json")
+
+    def booknlp_file(self, ext):
+        """Path of a BookNLP output file for the book"""
+        return os.path.join(self.booknlp_dir, f"{self.book_id}.{ext}")
+
+    def output_file(self, name):
+        return os.path.join(self.output_dir, name)
+
+DEFAULT_BOOK = Book(BOOK_ID, PDF_PATH, DATA_DIR, OUTPUT_DIR)
+
+class Stage:
+    """
+    A pipeline stage with declared dependencies, inputs and outputs.
+
+    The run function receives a dict holding the return value of every
+    dependency, keyed by stage name, and its own return value is made
+    available to the stages that depend on it. count_items, if given, maps
+    that return value to the item counts recorded in pipeline_metrics.json.
+    A stage fails if any of its inputs is missing before it runs or any of
+    its outputs is missing after.
+    """
+
+    def __init__(self, name, run, deps=(), inputs=(), outputs=(), count_items=None):
+        self.name = name
+        self.run = run
+        self.deps = list(deps)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.count_items = count_items
+
+def run_extract(book, results, force=False, jobs=1):
+    """Extract the PDF text and page index"""
+    from extract_pdf_text import extract_text_from_pdf, page_index_path
+    import pypdf
+
+    run_cached("extract",
+               [book.pdf_path],
+               {"extractor": "pypdf", "version": pypdf.__version__},
+               [book.text_path, page_index_path(book.text_path)],
+               lambda: extract_text_from_pdf(book.pdf_path, book.text_path, jobs=jobs),
+               force=force, manifest_path=book.cache_manifest)
+    return book.text_path
+
+def run_booknlp(book, results, force=False, spool_dir=None, chunk_chars=None, workers=2,
+                worker_timeout=None):
+    """
+    Run BookNLP over the extracted text
+
+    With spool_dir set, the book is queued for a running booknlp_worker
+    instead of loading the model in this process, waiting at most
+    worker_timeout seconds (booknlp_worker.DEFAULT_JOB_TIMEOUT if None). With chunk_chars set, the
+    book is processed in parallel chunks by booknlp_chunked, using workers
+    processes that each load their own model.
+    """
+    from process_text_with_booknlp import (
+        process_book_with_booknlp, MODEL_PARAMS, BOOKNLP_OUTPUT_EXTENSIONS)
+    from booknlp_worker import run_via_worker, DEFAULT_JOB_TIMEOUT
+
+    params = {"book_id": book.book_id, "model_params": MODEL_PARAMS}
+    if chunk_chars:
+        from booknlp_chunked import process_book_in_chunks
+        params["chunk_chars"] = chunk_chars
+        run = lambda: process_book_in_chunks(book.text_path, book.booknlp_dir, book.book_id,
+                                             chunk_chars=chunk_chars, workers=workers)
+    elif spool_dir:
+        timeout = worker_timeout if worker_timeout is not None else DEFAULT_JOB_TIMEOUT
+        run = lambda: run_via_worker(book.text_path, book.booknlp_dir, book.book_id, spool_dir,
+                                     timeout=timeout)
+    else:
+        run = lambda: process_book_with_booknlp(book.text_path, book.booknlp_dir, book.book_id)
+
+    run_cached("booknlp",
+               [book.text_path],
+               params,
+               [book.booknlp_file(ext) for ext in BOOKNLP_OUTPUT_EXTENSIONS],
+               run,
+               force=force, manifest_path=book.cache_manifest)
+    return book.booknlp_dir
+
+def run_characters(book, results, mention_format):
+    from process_text_with_booknlp import extract_characters, save_characters
+
+    character_data = extract_characters(book.booknlp_file("entities"), book.booknlp_file("tokens"),
+                                        book.booknlp_file("quotes"))
+    save_characters(character_data, book.output_dir, mention_format)
+    return character_data
+
+def run_token_scan(book, results):
+    """Read the tokens file once for both theme counting and character co-occurrence"""
+    from process_text_with_booknlp import extract_themes_and_relationships
+
+    return extract_themes_and_relationships(book.booknlp_file("entities"), book.booknlp_file("tokens"),
+                                            results["characters"])
+
+def run_token_index(book, results):
+    from token_index import TokenIndex
+
+    return TokenIndex.from_booknlp(book.booknlp_file("tokens"), book.text_path)
+
+def run_themes(book, results):
+    from process_text_with_booknlp import attach_evidence_snippets, save_data_to_json
+
+    theme_data, _ = results["token_scan"]
+    attach_evidence_snippets(theme_data, results["token_index"])
+    save_data_to_json(theme_data, "themes.json", book.output_dir)
+    return theme_data
+
+def run_relationships(book, results):
+    from process_text_with_booknlp import save_data_to_json
+
+    _, relationship_data = results["token_scan"]
+    save_data_to_json(relationship_data, "relationships.json", book.output_dir)
+    return relationship_data
+
+def run_supersense(book, results):
+    from supersense_join import extract_supersense_profiles
+    from process_text_with_booknlp import save_data_to_json
 
-def main():
-    """Run the full processing pipeline"""
+    supersense_data = extract_supersense_profiles(book.booknlp_file("supersense"),
+                                                  book.booknlp_file("tokens"), results["characters"])
+    save_data_to_json(supersense_data, "supersense.json", book.output_dir, indent=None)
+    return supersense_data
+
+def run_profiles(book, results):
+    from process_text_with_booknlp import create_character_profiles, save_data_to_json
+    from booknlp_book import load_character_summaries
+
+    # The .book file is optional; profiles just lack actions and attributes without it
+    book_file = book.booknlp_file("book")
+    character_summaries = (load_character_summaries(book_file, [c["id"] for c in results["characters"]])
+                           if os.path.exists(book_file) else None)
+    profile_data = create_character_profiles(results["characters"], results["relationships"],
+                                             character_summaries, results["token_index"],
+                                             results["supersense"])
+    save_data_to_json(profile_data, "character_profiles.json", book.output_dir)
+    return profile_data
+
+def run_quotes(book, results, jobs=1, quote_format=DEFAULT_QUOTE_FORMAT):
+    import extract_quotes
+
+    return extract_quotes.main(pdf_path=book.pdf_path, text_path=book.text_path,
+                               quotes_output=book.output_file(f"{book.book_id}_quotes.json"),
+                               explorer_output=book.output_file(f"{book.book_id}_quote_explorer.json"),
+                               index_output=book.output_file(f"{book.book_id}_quote_index.json"),
+                               search_index_output=book.output_file(f"{book.book_id}_quote_search.json"),
+                               jobs=jobs, output_format=quote_format)
+
+def run_search_index(book, results, quote_format=DEFAULT_QUOTE_FORMAT):
+    from quote_search import build_search_index, save_search_index
+    from quote_stream import iter_ndjson
+
+    # The quotes stage returns the quotes themselves, or only their count when streaming
+    quotes = results["quotes"]
+    quotes_path = book.output_file(f"{book.book_id}_quotes.json")
+    if quote_format == "ndjson":
+        quotes_path = ndjson_path(quotes_path)
+        quotes = iter_ndjson(quotes_path)
+    search_index = build_search_index(quotes, quotes_path)
+    save_search_index(search_index, book.output_file(f"{book.book_id}_quote_search.json"))
+    return search_index
+
+def count_pages(text_path):
+    from extract_pdf_text import load_page_index
+
+    index = load_page_index(text_path)
+    return {"pages": len(index["pages"]) if index else None}
+
+def count_booknlp_rows(book):
+    return {"tokens": count_data_rows(book.booknlp_file("tokens")),
+            "entities": count_data_rows(book.booknlp_file("entities")),
+            "quotes": count_data_rows(book.booknlp_file("quotes"))}
+
+def build_stages(book=DEFAULT_BOOK, force=False, jobs=1, booknlp_spool=None,
+                 booknlp_chunk_chars=None, booknlp_workers=2, booknlp_timeout=None,
+                 mention_format=DEFAULT_MENTION_FORMAT,
+                 quote_format=DEFAULT_QUOTE_FORMAT):
+    """Declare the stage graph for processing a book"""
+    quote_outputs = [book.output_file(f"{book.book_id}_quotes.json"),
+                     book.output_file(f"{book.book_id}_quote_explorer.json")]
+    if quote_format == "ndjson":
+        quote_outputs = [ndjson_path(path) for path in quote_outputs]
+    quote_outputs.append(book.output_file(f"{book.book_id}_quote_index.json"))
+    stages = [
+        Stage("extract", lambda r: run_extract(book, r, force=force, jobs=jobs),
+              inputs=[book.pdf_path], outputs=[book.text_path],
+              count_items=count_pages),
+        Stage("booknlp", lambda r: run_booknlp(book, r, force=force, spool_dir=booknlp_spool,
+                                         chunk_chars=booknlp_chunk_chars, workers=booknlp_workers,
+                                         worker_timeout=booknlp_timeout),
+              deps=["extract"],
+              inputs=[book.text_path], outputs=[book.booknlp_dir],
+              count_items=lambda _: count_booknlp_rows(book)),
+        Stage("characters", lambda r: run_characters(book, r, mention_format), deps=["booknlp"],
+              inputs=[book.booknlp_file("entities"), book.booknlp_file("quotes")],
+              outputs=[book.output_file("characters.json")],
+              count_items=lambda r: {"characters": len(r),
+                                     "mentions": sum(c["mention_count"] for c in r)}),
+        Stage("token_scan", lambda r: run_token_scan(book, r), deps=["booknlp", "characters"],
+              inputs=[book.booknlp_file("entities"), book.booknlp_file("tokens")]),
+        Stage("token_index", lambda r: run_token_index(book, r), deps=["booknlp"],
+              inputs=[book.booknlp_file("tokens"), book.text_path],
+              count_items=lambda r: {"tokens": len(r)}),
+        Stage("themes", lambda r: run_themes(book, r), deps=["token_scan", "token_index"],
+              outputs=[book.output_file("themes.json")],
+              count_items=lambda r: {"themes": len(r)}),
+        Stage("relationships", lambda r: run_relationships(book, r), deps=["token_scan"],
+              outputs=[book.output_file("relationships.json")],
+              count_items=lambda r: {"relationships": len(r)}),
+        Stage("supersense", lambda r: run_supersense(book, r), deps=["booknlp", "characters"],
+              inputs=[book.booknlp_file("supersense"), book.booknlp_file("tokens")],
+              outputs=[book.output_file("supersense.json")],
+              count_items=lambda r: {"categories": len(r["categories"]),
+                                     "chapters": len(r["chapters"])}),
+        Stage("profiles", lambda r: run_profiles(book, r),
+              deps=["characters", "relationships", "token_index", "supersense"],
+              outputs=[book.output_file("character_profiles.json")],
+              count_items=lambda r: {"profiles": len(r)}),
+        Stage("quotes", lambda r: run_quotes(book, r, jobs=jobs, quote_format=quote_format),
+              deps=["extract"], inputs=[book.text_path], outputs=quote_outputs,
+              count_items=lambda r: {"quotes": r if isinstance(r, int) else len(r)}),
+        Stage("search_index", lambda r: run_search_index(book, r, quote_format), deps=["quotes"],
+              outputs=[book.output_file(f"{book.book_id}_quote_search.json")],
+              count_items=lambda r: {"quotes": len(r["quote_ids"]), "terms": len(r["postings"])}),
+    ]
+    return {stage.name: stage for stage in stages}
+
+def select_stages(stages, targets):
+    """Return the names of the target stages and everything they depend on"""
+    selected = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in stages:
+            raise ValueError(f"Unknown stage '{name}'. Available stages: {', '.join(stages)}")
+        if name not in selected:
+            selected.add(name)
+            pending.extend(stages[name].deps)
+    return selected
+
+def run_pipeline(stages, targets=None, max_workers=4):
+    """
+    Run the stage graph in-process, starting each stage as soon as its
+    dependencies have finished so that independent stages run concurrently.
+
+    Args:
+        stages (dict): Stage name to Stage
+        targets (list): Stages to run along with their dependencies; all stages if None
+        max_workers (int): Maximum number of stages running at once
+
+    Returns:
+        tuple: (results dict, list of failed stage names, list of skipped stage
+            names, list of StageMetrics for the stages that ran)
+    """
+    selected = select_stages(stages, targets or list(stages))
+    results = {}
+    failed = []
+    skipped = []
+    done = set()
+    running = {}
+    metrics = []
+    print_lock = threading.Lock()
+
+    def execute(stage):
+        missing = [path for path in stage.inputs if not os.path.exists(path)]
+        if missing:
+            raise FileNotFoundError(f"missing inputs: {', '.join(missing)}")
+        with print_lock:
+            print(f"\n===== {stage.name}: started =====")
+        stage_metrics = StageMetrics(stage.name)
+        metrics.append(stage_metrics)
+        with stage_metrics:
+            result = stage.run({dep: results[dep] for dep in stage.deps})
+        missing = [path for path in stage.outputs if not os.path.exists(path)]
+        if missing:
+            raise FileNotFoundError(f"outputs not written: {', '.join(missing)}")
+        if stage.count_items:
+            stage_metrics.items = stage.count_items(result)
+        with print_lock:
+            print(f"===== {stage.name}: finished in {stage_metrics.wall_seconds:.1f}s =====")
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            # Start every stage whose dependencies have all completed
+            for name in stages:
+                if name not in selected or name in done or name in running.values():
+                    continue
+                if any(dep in failed or dep in skipped for dep in stages[name].deps):
+                    skipped.append(name)
+                    done.add(name)
+                    print(f"Skipping {name}: a dependency failed")
+                elif all(dep in results for dep in stages[name].deps):
+                    running[executor.submit(execute, stages[name])] = name
+
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                done.add(name)
+                try:
+                    results[name] = future.result()
+                except SystemExit as e:
+                    # Stage scripts may call sys.exit() on failure; it fails the stage, and
+                    # main() reports the failure, rather than ending the pipeline thread
+                    print(f"Error in stage {name}: exited with status {e.code!r}")
+                    failed.append(name)
+                except Exception as e:
+                    print(f"Error in stage {name}: {e!r}")
+                    failed.append(name)
+
+    return results, failed, skipped, metrics
+
+def main(force=False, targets=None, jobs=1, max_workers=4, book=DEFAULT_BOOK,
+         sample_fallback=True, booknlp_spool=None, booknlp_chunk_chars=None, booknlp_workers=2,
+         booknlp_timeout=None,
+         mention_format=DEFAULT_MENTION_FORMAT, quote_format=DEFAULT_QUOTE_FORMAT):
+    """
+    Run the full processing pipeline
+
+    Stages whose inputs are unchanged since their last run reuse their cached
+    outputs (see stage_cache.py) unless force is set.
+
+    Returns:
+        bool: True only if every selected stage succeeded; the command line
+            exits with status 1 otherwise, even when sample data was
+            written in place of the BookNLP outputs
+    """
     # Ensure output directory exists
-    os.makedirs("book_processing/output", exist_ok=True)
-    
-    # Step 1: Extract text from PDF
-    if not run_command("python book_processing/extract_pdf_text.py", 
-                      "Extracting text from PDF"):
+    os.makedirs(book.output_dir, exist_ok=True)
+
+    stages = build_stages(book, force=force, jobs=jobs, booknlp_spool=booknlp_spool,
+                          booknlp_chunk_chars=booknlp_chunk_chars, booknlp_workers=booknlp_workers,
+                          booknlp_timeout=booknlp_timeout,
+                          mention_format=mention_format,
+                          quote_format=quote_format)
+    start = time.perf_counter()
+    results, failed, skipped, metrics = run_pipeline(stages, targets, max_workers=max_workers)
+    write_metrics(metrics, book.output_file("pipeline_metrics.json"), book.book_id,
+                  total_wall_seconds=time.perf_counter() - start)
+
+    if "extract" in failed:
         print("Failed to extract text from PDF. Aborting.")
         return False
-    
-    # Step 2: Process the text with BookNLP
-    if not run_command("python book_processing/process_text_with_booknlp.py", 
-                      "Processing with BookNLP"):
+
+    if "booknlp" in failed and sample_fallback:
         print("Failed to process text with BookNLP. Using sample data instead.")
         # Fall back to sample data if BookNLP processing fails
-        return run_command("python book_processing/generate_sample_data.py",
-                          "Generating sample data")
-    
+        from generate_sample_data import generate_all_sample_data
+        generate_all_sample_data()
+        print(f"\n===== Processing finished with errors in: {', '.join(failed)} =====")
+        return False
+
+    if failed:
+        print(f"\n===== Processing finished with errors in: {', '.join(failed)} =====")
+        return False
+
     print("\n===== Processing complete =====")
     print("All processing steps completed successfully!")
     return True
 
 if __name__ == "__main__":
-    success = main()
-    sys.exit(0 if success else 1)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the book processing pipeline")
+    parser.add_argument("targets", nargs="*",
+                        help="Stages to run along with their dependencies (default: all)")
+    parser.add_argument("--force", action="store_true",
+                        help="Rerun cached stages even if their inputs are unchanged")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Worker processes for PDF extraction and quote mining")
+    parser.add_argument("--max-stages", type=int, default=4,
+                        help="Maximum number of stages running at once")
+    parser.add_argument("--booknlp-spool",
+                        help="Send BookNLP work to a booknlp_worker watching this spool directory")
+    parser.add_argument("--booknlp-timeout", type=float,
+                        help="Seconds to wait for the booknlp_worker before failing the stage "
+                             "(default: 4 hours)")
+    parser.add_argument("--booknlp-chunk-chars", type=int,
+                        help="Run BookNLP in parallel chunks of about this many characters")
+    parser.add_argument("--booknlp-workers", type=int, default=2,
+                        help="Worker processes for chunked BookNLP, each loading its own model")
+    parser.add_argument("--mentions", choices=MENTION_FORMATS, default=DEFAULT_MENTION_FORMAT,
+                        help="How character mentions are written to characters.json")
+    parser.add_argument("--quotes-format", choices=QUOTE_FORMATS, default=DEFAULT_QUOTE_FORMAT,
+                        help="Write quotes as indented JSON, or stream them as JSON Lines (.ndjson)")
+    args = parser.parse_args()
+
+    success = main(force=args.force, targets=args.targets or None,
+                   jobs=args.jobs, max_workers=args.max_stages,
+                   booknlp_spool=args.booknlp_spool,
+                   booknlp_chunk_chars=args.booknlp_chunk_chars,
+                   booknlp_workers=args.booknlp_workers,
+                   booknlp_timeout=args.booknlp_timeout,
+                   mention_format=args.mentions, quote_format=args.quotes_format)
+    sys.exit(0 if success else 1)
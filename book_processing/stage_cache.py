@@ -0,0 +1,89 @@
+import os
+import json
+import hashlib
+import threading
+
+# Manifest recording the input key and outputs of every cached stage
+CACHE_MANIFEST = "book_processing/data/stage_cache.json"
+
+# Serialises manifest updates from stages running on different threads
+_manifest_lock = threading.Lock()
+
+def hash_inputs(input_paths, params=None):
+    """
+    Compute a content hash over a stage's input files and parameters.
+
+    Args:
+        input_paths (list): Files (or directories, hashed recursively) the stage reads
+        params (dict): Parameters that change the stage's output, e.g. BookNLP model_params
+
+    Returns:
+        str: Hex digest identifying this exact set of inputs
+    """
+    digest = hashlib.sha256()
+    for path in input_paths:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(root, name)
+                           for root, _, names in os.walk(path) for name in names)
+        else:
+            files = [path]
+        for file_path in files:
+            # Include the name so renaming a file inside a directory changes the key
+            digest.update(os.path.basename(file_path).encode("utf-8"))
+            with open(file_path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+    digest.update(json.dumps(params or {}, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+def load_manifest(manifest_path=CACHE_MANIFEST):
+    """Load the cache manifest, or an empty one if it does not exist yet"""
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+def save_manifest(manifest, manifest_path=CACHE_MANIFEST):
+    """Write the cache manifest atomically"""
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+def run_cached(stage_name, input_paths, params, output_paths, run, force=False,
+               manifest_path=CACHE_MANIFEST):
+    """
+    Run a stage unless its inputs are unchanged since the last successful run.
+
+    A stage is skipped when the hash of its inputs and parameters matches the
+    one recorded after its previous run and all of its outputs still exist.
+
+    Args:
+        stage_name (str): Name of the stage in the manifest
+        input_paths (list): Files or directories the stage reads
+        params (dict): Parameters that affect the stage's output
+        output_paths (list): Files the stage produces
+        run (callable): Zero-argument function that performs the stage
+        force (bool): Run the stage even if the cache is fresh
+
+    Returns:
+        bool: True if the stage ran, False if cached outputs were reused
+    """
+    key = hash_inputs(input_paths, params)
+    manifest = load_manifest(manifest_path)
+    entry = manifest.get(stage_name)
+
+    if (not force and entry and entry["key"] == key
+            and all(os.path.exists(path) for path in output_paths)):
+        print(f"Inputs for '{stage_name}' unchanged, reusing cached outputs")
+        return False
+
+    run()
+
+    # Re-read in case another stage updated the manifest while this one ran
+    with _manifest_lock:
+        manifest = load_manifest(manifest_path)
+        manifest[stage_name] = {"key": key, "outputs": list(output_paths)}
+        save_manifest(manifest, manifest_path)
+    return True
@@ -0,0 +1,115 @@
+import heapq
+from bisect import bisect_right
+
+from booknlp_tables import load_supersense, load_tokens
+
+# Tokens on either side of a mention that still count as near the character,
+# so "he said" links verb.communication to the character "he" refers to
+MENTION_WINDOW_TOKENS = 3
+
+def chapter_start_tokens(tokens_file):
+    """Token IDs where each "Chapter <n>" heading starts, in order"""
+    tokens = load_tokens(tokens_file)
+    words = tokens["word"]
+    vocab = tokens.vocab["word"]
+    chapter = vocab.code("Chapter")
+    token_ids = tokens["token_ID_within_document"]
+    return [token_ids[row] for row in range(len(words) - 1)
+            if words[row] == chapter and vocab.decode(words[row + 1]).isdigit()]
+
+def mention_intervals(character_data):
+    """All mentions as (start_token, end_token, character index), sorted by start"""
+    intervals = []
+    for index, character in enumerate(character_data):
+        mentions = character["mentions"]
+        intervals.extend((start, end, index) for start, end in zip(mentions.starts, mentions.ends))
+    intervals.sort()
+    return intervals
+
+def join_character_supersenses(spans, intervals, character_count, category_count,
+                               window=MENTION_WINDOW_TOKENS):
+    """
+    Count the supersense categories of spans that overlap each character's mentions.
+
+    Both inputs are sorted by start token and swept together. Mentions
+    enter a heap, keyed by where they stop overlapping, once a span reaches
+    them and leave it once spans have moved past, so each span is only
+    compared with the mentions around it.
+
+    Args:
+        spans (list): (start_token, end_token, category code), sorted
+        intervals (list): mention_intervals output
+        window (int): Tokens a mention is widened by on each side
+
+    Returns:
+        list: One count vector (a list indexed by category code) per character
+    """
+    counts = [[0] * category_count for _ in range(character_count)]
+    active = []
+    next_mention = 0
+    for start, end, category in spans:
+        while next_mention < len(intervals) and intervals[next_mention][0] - window <= end:
+            mention_start, mention_end, character = intervals[next_mention]
+            heapq.heappush(active, (mention_end + window, mention_start - window, character))
+            next_mention += 1
+        while active and active[0][0] < start:
+            heapq.heappop(active)
+        characters = {character for _, reach_start, character in active if reach_start <= end}
+        for character in characters:
+            counts[character][category] += 1
+    return counts
+
+def chapter_supersenses(spans, chapter_starts, category_count):
+    """
+    Count supersense categories per chapter.
+
+    Returns:
+        list: One count vector per chapter; entry 0 covers any text before
+            the first chapter heading
+    """
+    counts = [[0] * category_count for _ in range(len(chapter_starts) + 1)]
+    for start, _, category in spans:
+        counts[bisect_right(chapter_starts, start)][category] += 1
+    return counts
+
+def extract_supersense_profiles(supersense_file, tokens_file, character_data,
+                                window=MENTION_WINDOW_TOKENS):
+    """
+    Per-character and per-chapter supersense distributions.
+
+    Args:
+        supersense_file (str): Path to the .supersense file
+        tokens_file (str): Path to the .tokens file, for chapter boundaries
+        character_data (list): Character dictionaries from extract_characters
+
+    Returns:
+        dict: "categories" (the category names, in count-vector order),
+            "characters" (character ID to count vector) and "chapters"
+            (count vectors in chapter order, starting with the front matter)
+    """
+    print("Joining supersenses with character mentions and chapters...")
+    supersense = load_supersense(supersense_file)
+    categories = supersense.vocab["supersense_category"].strings
+    spans = sorted(zip(supersense["start_token"], supersense["end_token"],
+                       supersense["supersense_category"]))
+
+    character_counts = join_character_supersenses(spans, mention_intervals(character_data),
+                                                  len(character_data), len(categories), window)
+    chapter_counts = chapter_supersenses(spans, chapter_start_tokens(tokens_file), len(categories))
+
+    print(f"Counted {len(categories)} supersense categories for {len(character_data)} characters "
+          f"and {len(chapter_counts)} chapters")
+    return {
+        "categories": list(categories),
+        "characters": {character["id"]: counts
+                       for character, counts in zip(character_data, character_counts)},
+        "chapters": chapter_counts
+    }
+
+def top_supersenses(supersense_data, character_id, top=5):
+    """A character's most frequent supersense categories, as {category: count}"""
+    counts = supersense_data["characters"].get(character_id)
+    if not counts:
+        return {}
+    ranked = sorted(range(len(counts)), key=lambda code: counts[code], reverse=True)
+    return {supersense_data["categories"][code]: counts[code] for code in ranked[:top] if counts[code]}
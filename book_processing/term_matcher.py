@@ -0,0 +1,48 @@
+import re
+from bisect import bisect_left
+
+class TermMatcher:
+    """
+    Finds every occurrence of a fixed set of terms, case-insensitively.
+
+    The terms are lowercased and deduplicated once. find() lowercases the
+    text once and locates each term with str.find, which for a few dozen
+    terms is several times faster than one big regular expression in
+    Python's regex engine, and finds overlapping hits as well.
+
+    Args:
+        terms (iterable): The strings to look for
+    """
+
+    def __init__(self, terms):
+        self.terms = list(dict.fromkeys(terms))
+        self.folded = {}
+        for term in self.terms:
+            self.folded.setdefault(term.lower(), []).append(term)
+        # For the rare text whose lowercase form has a different length
+        self.patterns = {folded: re.compile(re.escape(folded), re.IGNORECASE) for folded in self.folded}
+
+    def find(self, text):
+        """
+        Returns:
+            list: (position, term, matched_text) for every hit, sorted by
+                position; matched_text is the text as it appears, for
+                case-sensitive checks
+        """
+        lowered = text.lower()
+        hits = []
+        for folded, terms in self.folded.items():
+            if len(lowered) == len(text):
+                position = lowered.find(folded)
+                while position != -1:
+                    hits.extend((position, term, text[position:position + len(term)]) for term in terms)
+                    position = lowered.find(folded, position + 1)
+            else:
+                for match in self.patterns[folded].finditer(text):
+                    hits.extend((match.start(), term, match.group()) for term in terms)
+        hits.sort()
+        return hits
+
+def hits_between(hits, start, end):
+    """The hits from TermMatcher.find that start within text[start:end]"""
+    return hits[bisect_left(hits, (start,)):bisect_left(hits, (end,))]
@@ -0,0 +1,85 @@
+from bisect import bisect_left, bisect_right
+
+from booknlp_tables import load_tokens
+
+class TokenIndex:
+    """
+    Maps BookNLP token, sentence and paragraph IDs back to the book's text.
+
+    Every column is held in token order, which is also sorted order for
+    token, sentence and paragraph IDs, so lookups are binary searches over
+    the columns of the (binary-cached) tokens table: O(log n) per query and
+    no rescan of the tokens file.
+
+    BookNLP's byte_onset and byte_offset columns are character offsets into
+    the text it was given, so text is the decoded contents of that file.
+    """
+
+    def __init__(self, token_ids, sentence_ids, paragraph_ids, onsets, offsets, text):
+        self.token_ids = token_ids
+        self.sentence_ids = sentence_ids
+        self.paragraph_ids = paragraph_ids
+        self.onsets = onsets
+        self.offsets = offsets
+        self.text = text
+
+    @classmethod
+    def from_booknlp(cls, tokens_file, text_file):
+        tokens = load_tokens(tokens_file)
+        with open(text_file, "r", encoding="utf-8") as f:
+            text = f.read()
+        return cls(tokens["token_ID_within_document"], tokens["sentence_ID"], tokens["paragraph_ID"],
+                   tokens["byte_onset"], tokens["byte_offset"], text)
+
+    def __len__(self):
+        return len(self.token_ids)
+
+    def _row(self, token_id):
+        row = bisect_left(self.token_ids, token_id)
+        if row == len(self.token_ids) or self.token_ids[row] != token_id:
+            raise KeyError(f"Unknown token {token_id}")
+        return row
+
+    def sentence_of(self, token_id):
+        return self.sentence_ids[self._row(token_id)]
+
+    def paragraph_of(self, token_id):
+        return self.paragraph_ids[self._row(token_id)]
+
+    def char_span(self, start_token, end_token):
+        """Character offsets in the text covering tokens start_token..end_token inclusive"""
+        return self.onsets[self._row(start_token)], self.offsets[self._row(end_token)]
+
+    def sentence_tokens(self, sentence_id):
+        """First and last token ID of a sentence"""
+        first = bisect_left(self.sentence_ids, sentence_id)
+        last = bisect_right(self.sentence_ids, sentence_id) - 1
+        if last < first:
+            raise KeyError(f"Unknown sentence {sentence_id}")
+        return self.token_ids[first], self.token_ids[last]
+
+    def span_text(self, start_token, end_token, context_sentences=None):
+        """
+        Text of a token span, optionally widened to whole sentences.
+
+        Args:
+            start_token (int): First token ID of the span
+            end_token (int): Last token ID of the span, inclusive
+            context_sentences (int): If given, return the sentences the span
+                falls in plus this many sentences on each side
+
+        Returns:
+            str: The text with runs of whitespace collapsed
+        """
+        if context_sentences is not None:
+            first_sentence = self.sentence_of(start_token) - context_sentences
+            last_sentence = self.sentence_of(end_token) + context_sentences
+            start_row = bisect_left(self.sentence_ids, first_sentence)
+            end_row = bisect_right(self.sentence_ids, last_sentence) - 1
+            start, end = self.onsets[start_row], self.offsets[end_row]
+        else:
+            start, end = self.char_span(start_token, end_token)
+        return " ".join(self.text[start:end].split())
+
+    def sentence_text(self, sentence_id):
+        return self.span_text(*self.sentence_tokens(sentence_id))
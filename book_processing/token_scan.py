@@ -0,0 +1,177 @@
+from collections import defaultdict, deque
+
+class TokenConsumer:
+    """
+    Base class for analyses fed by scan_tokens.
+
+    token() is called once per token in document order with the raw string
+    values of the token's paragraph, sentence and document-level token IDs
+    and its word. finish() is called after the last token.
+    """
+
+    def token(self, paragraph_id, sentence_id, token_id, word):
+        pass
+
+    def finish(self):
+        pass
+
+def scan_tokens(tokens_file, consumers):
+    """
+    Read a BookNLP .tokens file once and feed every token to each consumer.
+
+    Columns are located by header name, so I/O and parsing are paid once
+    however many analyses are registered.
+
+    Args:
+        tokens_file (str): Path to the .tokens file
+        consumers (list): TokenConsumer instances
+
+    Returns:
+        list: The consumers, for convenience
+    """
+    with open(tokens_file, "r", encoding="utf-8") as f:
+        header = f.readline().rstrip("\n").split("\t")
+        para_idx = header.index("paragraph_ID")
+        sentence_idx = header.index("sentence_ID")
+        token_idx = header.index("token_ID_within_document")
+        word_idx = header.index("word")
+        width = max(para_idx, sentence_idx, token_idx, word_idx) + 1
+
+        callbacks = [consumer.token for consumer in consumers]
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) < width:
+                continue
+            paragraph_id = parts[para_idx]
+            sentence_id = parts[sentence_idx]
+            token_id = parts[token_idx]
+            word = parts[word_idx]
+            for callback in callbacks:
+                callback(paragraph_id, sentence_id, token_id, word)
+
+    for consumer in consumers:
+        consumer.finish()
+    return consumers
+
+class PhraseMatcher:
+    """
+    Aho-Corasick automaton over token sequences.
+
+    Each phrase is split on whitespace into words. feed() advances the
+    automaton by one token and returns the phrases that end at it, so every
+    occurrence of every phrase is reported exactly once in a single pass.
+    """
+
+    def __init__(self, phrases):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for phrase in phrases:
+            state = 0
+            for word in phrase.split():
+                next_state = self.goto[state].get(word)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][word] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = next_state
+            if phrase not in self.output[state]:
+                self.output[state].append(phrase)
+
+        # Breadth-first, so a state's failure target is finished before its children
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, child in self.goto[state].items():
+                fallback = self.fail[state]
+                while fallback and word not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(word, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+                queue.append(child)
+        self.state = 0
+
+    def feed(self, word):
+        goto = self.goto
+        state = self.state
+        while state and word not in goto[state]:
+            state = self.fail[state]
+        self.state = goto[state].get(word, 0)
+        return self.output[self.state]
+
+    def reset(self):
+        self.state = 0
+
+class ThemeKeywordCounter(TokenConsumer):
+    """
+    Counts theme keyword hits and records the sentences they occur in.
+
+    Keywords are matched against lowercased tokens; a multi-word keyword
+    matches a run of consecutive tokens and is counted once, at its last
+    token. A keyword listed twice for a theme is counted once.
+    """
+
+    def __init__(self, theme_keywords):
+        self.theme_keywords = theme_keywords
+        self.counts = {theme: 0 for theme in theme_keywords}
+        self.evidence = {theme: [] for theme in theme_keywords}
+        self._seen_sentences = {theme: set() for theme in theme_keywords}
+        self._themes_by_keyword = defaultdict(list)
+        for theme, keywords in theme_keywords.items():
+            for keyword in dict.fromkeys(keywords):
+                self._themes_by_keyword[keyword].append(theme)
+        self._matcher = PhraseMatcher(self._themes_by_keyword)
+
+    def token(self, paragraph_id, sentence_id, token_id, word):
+        for keyword in self._matcher.feed(word.lower()):
+            for theme in self._themes_by_keyword[keyword]:
+                self.counts[theme] += 1
+                if sentence_id not in self._seen_sentences[theme]:
+                    self._seen_sentences[theme].add(sentence_id)
+                    self.evidence[theme].append(sentence_id)
+
+class KeywordSentenceCollector(TokenConsumer):
+    """Records, per theme, the sentence of every token containing one of its keywords"""
+
+    def __init__(self, themes):
+        self.themes = themes
+        self.evidence = defaultdict(list)
+
+    def token(self, paragraph_id, sentence_id, token_id, word):
+        word = word.lower()
+        for theme in self.themes:
+            if any(keyword in word for keyword in theme["keywords"]):
+                self.evidence[theme["name"]].append(sentence_id)
+
+class MentionCollector(TokenConsumer):
+    """
+    Records where each character mention falls, for cooccurrence.cooccurrence.
+
+    A new chapter starts at each "Chapter" heading, that is "Chapter"
+    followed by a number.
+
+    Args:
+        mention_starts (dict): Start token ID (as a string) to the set of
+            character IDs whose mentions begin at that token
+    """
+
+    def __init__(self, mention_starts):
+        self.mention_starts = mention_starts
+        # (token, sentence, paragraph, chapter, character_id) in document order
+        self.mentions = []
+        self._previous_word = None
+        self._chapter = 0
+
+    def token(self, paragraph_id, sentence_id, token_id, word):
+        if self._previous_word == "Chapter" and word.isdigit():
+            self._chapter += 1
+        self._previous_word = word
+        characters = self.mention_starts.get(token_id)
+        if characters:
+            token = int(token_id)
+            sentence = int(sentence_id)
+            paragraph = int(paragraph_id)
+            for character in characters:
+                self.mentions.append((token, sentence, paragraph, self._chapter, character))
@@ -9,7 +9,8 @@ interface CharacterData {
   quote_count: number;
   gender: string;
   sample_quotes: string[];
-  mentions?: any[];
+  // Written as parallel arrays, or omitted, by the book_processing pipeline
+  mentions?: any;
 }
 
 interface ThemeData {
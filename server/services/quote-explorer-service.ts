@@ -1,5 +1,6 @@
 import fs from 'fs';
 import path from 'path';
+import readline from 'readline';
 import { fileURLToPath } from 'url';
 import { dirname } from 'path';
 import type { Quote, QuoteTheme, QuoteExplorerData } from '@shared/schema';
@@ -30,6 +31,20 @@ interface SignificantQuoteData {
   character?: string;
 }
 
+// Inverted indexes written by extract_quotes.py (1984_quote_index.json):
+// facet name or number to the IDs of quotes in 1984_quotes.json, ascending
+interface QuoteIndexData {
+  source?: { file: string | null; quoteCount: number };
+  quoteCount: number;
+  themes: Record<string, number[]>;
+  characters: Record<string, number[]>;
+  chapters: Record<string, number[]>;
+  significance: Record<string, number[]>;
+}
+
+// Quotes the explorer data lists as most significant (MOST_SIGNIFICANT_LIMIT in extract_quotes.py)
+const MOST_SIGNIFICANT_LIMIT = 50;
+
 /**
  * Service for the Quote Explorer feature
  * Extracts and analyzes memorable quotes from "1984" using BookNLP data
@@ -39,6 +54,11 @@ class QuoteExplorerService {
   private quoteThemeData: Map<number, number[]> = new Map(); // Quote ID to Theme IDs
   private characterMap: Map<number, string> = new Map(); // Character ID to name
   private themeMap: Map<number, string> = new Map(); // Theme ID to name
+  private quoteById: Map<number, Quote> = new Map();
+  private themePostings: Map<number, number[]> = new Map(); // Theme ID to quote IDs
+  private characterPostings: Map<number, number[]> = new Map(); // Character ID to quote IDs
+  private chapterPostings: Map<number, number[]> = new Map(); // Chapter ID to quote IDs
+  private significancePostings: Map<number, number[]> = new Map(); // Significance to quote IDs
   private initialized: boolean = false;
   
   constructor() {
@@ -65,6 +85,38 @@ class QuoteExplorerService {
         path.resolve(process.cwd(), 'dist/data/1984_quote_explorer.json')
       ];
       
+      // Prefer the prebuilt quote index, with the quotes file it was built from
+      for (const explorerPath of possiblePaths) {
+        const indexPath = explorerPath.replace(/_quote_explorer\.json$/, '_quote_index.json');
+        if (!fs.existsSync(indexPath)) {
+          continue;
+        }
+        try {
+          const indexed = this.readIndexedQuotes(indexPath);
+          if (indexed) {
+            this.processIndexData(indexed.index, indexed.quotes);
+            this.initialized = true;
+            console.log(`[quote-explorer] Loaded ${this.quoteData.length} indexed quotes from: ${indexPath}`);
+            return;
+          }
+        } catch (err) {
+          console.log(`[quote-explorer] Could not load quote index from ${indexPath}`);
+        }
+      }
+      
+      // Otherwise prefer the line-delimited variant (extract_quotes.py --format ndjson),
+      // which is read incrementally instead of parsed as one document
+      const ndjsonPath = possiblePaths
+        .map(filePath => filePath.replace(/\.json$/, '.ndjson'))
+        .find(filePath => fs.existsSync(filePath));
+      if (ndjsonPath) {
+        this.loadExplorerLines(ndjsonPath).catch(error => {
+          console.error(`[quote-explorer] Error reading ${ndjsonPath}:`, error);
+          this.loadSampleData();
+        });
+        return;
+      }
+      
       let quoteExplorerData = null;
       let usedPath = '';
       
@@ -96,6 +148,170 @@ class QuoteExplorerService {
     }
   }
   
+  /**
+   * Load the quotes the explorer shows from the prebuilt quote index.
+   *
+   * As with the explorer data, these are the most significant themed
+   * quotes (significance 4 or more, at most MOST_SIGNIFICANT_LIMIT),
+   * renumbered from 1 in significance order. They are read from the
+   * index's significance postings rather than by scanning every quote.
+   * Theme and character IDs follow the order of the index's keys, as they
+   * do for the explorer data.
+   */
+  private processIndexData(index: QuoteIndexData, quotes: Quote[]): void {
+    const quotesById = new Map(quotes.map(quote => [quote.id, quote]));
+    const sourceIds = Object.keys(index.significance)
+      .map(Number)
+      .filter(significance => significance >= 4)
+      .sort((a, b) => b - a)
+      .flatMap(significance => index.significance[String(significance)])
+      .slice(0, MOST_SIGNIFICANT_LIMIT);
+    
+    const quoteData: Quote[] = sourceIds.map((sourceId, position) => {
+      const quote = quotesById.get(sourceId);
+      if (!quote) {
+        throw new Error(`Quote ${sourceId} from the index is missing from the quotes file`);
+      }
+      return { ...quote, id: position + 1, characterId: quote.characterId ?? null,
+               page: quote.page ?? null, context: quote.context ?? null };
+    });
+    const serverIds = new Map(sourceIds.map((sourceId, position): [number, number] => [sourceId, position + 1]));
+    
+    const themeMap = new Map<number, string>();
+    const quoteThemeData = new Map<number, number[]>();
+    Object.entries(index.themes).forEach(([themeName, quoteIds], position) => {
+      themeMap.set(position + 1, themeName);
+      for (const sourceId of quoteIds) {
+        const quoteId = serverIds.get(sourceId);
+        if (quoteId === undefined) {
+          continue;
+        }
+        const themeIds = quoteThemeData.get(quoteId);
+        if (themeIds) {
+          themeIds.push(position + 1);
+        } else {
+          quoteThemeData.set(quoteId, [position + 1]);
+        }
+      }
+    });
+    
+    const characterMap = new Map<number, string>();
+    Object.keys(index.characters).forEach((characterName, position) => {
+      characterMap.set(position + 1, characterName);
+    });
+    
+    this.quoteData = quoteData;
+    this.themeMap = themeMap;
+    this.characterMap = characterMap;
+    this.quoteThemeData = quoteThemeData;
+    this.buildPostings();
+  }
+  
+  /**
+   * Check that a quote index was built from the quotes file beside it.
+   *
+   * The index records the name and quote count of its source file. Only a
+   * matching .json source is used here; an index built from a streamed
+   * .ndjson run is left to the line-delimited explorer loader.
+   */
+  private readIndexedQuotes(indexPath: string): { index: QuoteIndexData, quotes: Quote[] } | null {
+    const index: QuoteIndexData = JSON.parse(fs.readFileSync(indexPath, 'utf-8'));
+    if (!index.source || !index.source.file || !index.source.file.endsWith('.json')) {
+      return null;
+    }
+    const quotesPath = path.join(path.dirname(indexPath), index.source.file);
+    if (!fs.existsSync(quotesPath)) {
+      return null;
+    }
+    const quotes: Quote[] = JSON.parse(fs.readFileSync(quotesPath, 'utf-8'));
+    if (quotes.length !== index.source.quoteCount) {
+      console.log(`[quote-explorer] ${indexPath} was built from ${index.source.quoteCount} quotes, ` +
+                  `but ${quotesPath} has ${quotes.length}; not using it`);
+      return null;
+    }
+    return { index, quotes };
+  }
+  
+  /**
+   * Build the facet posting lists from the loaded quotes, in one pass,
+   * when no prebuilt quote index was found
+   */
+  private buildPostings(): void {
+    const addPosting = (postings: Map<number, number[]>, key: number, quoteId: number) => {
+      const quoteIds = postings.get(key);
+      if (quoteIds) {
+        quoteIds.push(quoteId);
+      } else {
+        postings.set(key, [quoteId]);
+      }
+    };
+    
+    this.quoteById = new Map(this.quoteData.map(quote => [quote.id, quote]));
+    this.themePostings = new Map();
+    this.characterPostings = new Map();
+    this.chapterPostings = new Map();
+    this.significancePostings = new Map();
+    for (const quote of this.quoteData) {
+      for (const themeId of this.quoteThemeData.get(quote.id) || []) {
+        addPosting(this.themePostings, themeId, quote.id);
+      }
+      if (quote.characterId !== null) {
+        addPosting(this.characterPostings, quote.characterId, quote.id);
+      }
+      addPosting(this.chapterPostings, quote.chapterId, quote.id);
+      addPosting(this.significancePostings, quote.significance, quote.id);
+    }
+  }
+  
+  /**
+   * Look up the quotes in a posting list
+   */
+  private postingQuotes(quoteIds: number[] | undefined): Quote[] {
+    const quotes: Quote[] = [];
+    for (const quoteId of quoteIds || []) {
+      const quote = this.quoteById.get(quoteId);
+      if (quote) {
+        quotes.push(quote);
+      }
+    }
+    return quotes;
+  }
+  
+  /**
+   * Read explorer data written as JSON Lines, one line at a time.
+   *
+   * The first line names the themes and characters; the rest place one
+   * quote in a section. Only the names and the most significant quotes are
+   * kept, which is all processExplorerData uses, so memory does not grow
+   * with the number of theme and character entries.
+   */
+  private async loadExplorerLines(filePath: string): Promise<void> {
+    const lines = readline.createInterface({
+      input: fs.createReadStream(filePath, { encoding: 'utf-8' }),
+      crlfDelay: Infinity
+    });
+    
+    const data: any = { quotesByTheme: {}, quotesByCharacter: {}, mostSignificantQuotes: [] };
+    let header = true;
+    for await (const line of lines) {
+      if (!line.trim()) {
+        continue;
+      }
+      const record = JSON.parse(line);
+      if (header) {
+        record.themes.forEach((themeName: string) => { data.quotesByTheme[themeName] = []; });
+        record.characters.forEach((characterName: string) => { data.quotesByCharacter[characterName] = []; });
+        header = false;
+      } else if (record.section === 'mostSignificantQuotes') {
+        data.mostSignificantQuotes.push(record.quote);
+      }
+    }
+    
+    this.processExplorerData(data);
+    this.initialized = true;
+    console.log(`[quote-explorer] Loaded quote explorer lines from: ${filePath}`);
+  }
+  
   /**
    * Process explorer data from pre-processed file
    */
@@ -135,6 +351,8 @@ class QuoteExplorerService {
         }
       }
     });
+    
+    this.buildPostings();
   }
   
   /**
@@ -218,6 +436,7 @@ class QuoteExplorerService {
     this.quoteThemeData.set(4, [1, 3]); // Fourth quote relates to Totalitarianism and Psychological Manipulation
     this.quoteThemeData.set(5, [1, 2]); // Fifth quote relates to Totalitarianism and Control of Information
     
+    this.buildPostings();
     this.initialized = true;
   }
   
@@ -265,33 +484,31 @@ class QuoteExplorerService {
    * Get quotes by theme ID
    */
   public getQuotesByThemeId(themeId: number): Quote[] {
-    return this.quoteData.filter(quote => {
-      const themeIds = this.quoteThemeData.get(quote.id) || [];
-      return themeIds.includes(themeId);
-    });
+    return this.postingQuotes(this.themePostings.get(themeId));
   }
   
   /**
    * Get quotes by character ID
    */
   public getQuotesByCharacterId(characterId: number): Quote[] {
-    return this.quoteData.filter(quote => quote.characterId === characterId);
+    return this.postingQuotes(this.characterPostings.get(characterId));
   }
   
   /**
    * Get quotes by chapter ID
    */
   public getQuotesByChapterId(chapterId: number): Quote[] {
-    return this.quoteData.filter(quote => quote.chapterId === chapterId);
+    return this.postingQuotes(this.chapterPostings.get(chapterId));
   }
   
   /**
    * Get most significant quotes (significance >= 4)
    */
   public getMostSignificantQuotes(): Quote[] {
-    return this.quoteData
-      .filter(quote => quote.significance >= 4)
-      .sort((a, b) => b.significance - a.significance);
+    return Array.from(this.significancePostings.keys())
+      .filter(significance => significance >= 4)
+      .sort((a, b) => b - a)
+      .flatMap(significance => this.postingQuotes(this.significancePostings.get(significance)));
   }
   
   /**